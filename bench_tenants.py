@@ -0,0 +1,99 @@
+"""Замер памяти на получателя: TenantTable против словаря на получателя.
+
+Запуск: python bench_tenants.py [-n 100000]
+
+Каждый вариант считается в отдельном процессе. Строки настроек
+(имя, токен, чат) создаются до замера и общие для обоих вариантов,
+поэтому в результат входит только состояние получателей.
+"""
+import argparse
+import gc
+import heapq
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+from tenants_bot import TenantTable
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+def rss():
+    """Текущий RSS процесса в байтах."""
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def make_configs(count):
+    """Настройки count получателей."""
+    return {f'tenant-{i}': {'name': f'tenant-{i}',
+                            'practicum_token': f'y0_{i:036d}',
+                            'chat_id': str(10 ** 9 + i)}
+            for i in range(count)}
+
+
+def build_table(configs):
+    """Столбцовое состояние получателей."""
+    table = TenantTable(600, STATUSES)
+    table.apply(configs, 0.0)
+    return table
+
+
+def build_dicts(configs):
+    """Состояние в виде словаря на получателя и кучи сроков.
+
+    Хранит то же, что TenantTable: обе метки, неподтверждённые
+    уведомления, время удачного опроса и флаги, а порядок по давности
+    опроса — в OrderedDict.
+    """
+    states = {}
+    heap = []
+    staleness = OrderedDict()
+    for name, config in configs.items():
+        states[name] = {'config': config, 'cursor': 1700000000,
+                        'acked': 1700000000, 'unacked': 0,
+                        'deadline': 0.0, 'status': None, 'errors': 0,
+                        'backoff': 0.0, 'last_success': 0.0,
+                        'running': False, 'rewind': False}
+        heapq.heappush(heap, (0.0, name))
+        staleness[name] = None
+    return states, heap, staleness
+
+
+VARIANTS = {'table': build_table, 'dicts': build_dicts}
+
+
+def measure(variant, count):
+    """Прирост RSS на получателя для одного варианта."""
+    configs = make_configs(count)
+    gc.collect()
+    before = rss()
+    state = VARIANTS[variant](configs)
+    gc.collect()
+    after = rss()
+    del state
+    return (after - before) / count
+
+
+def main():
+    """Запускает варианты в отдельных процессах и печатает результат."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=100000,
+                        help='число получателей')
+    parser.add_argument('--variant', choices=VARIANTS)
+    args = parser.parse_args()
+    if args.variant:
+        print(measure(args.variant, args.n))
+        return
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, __file__, '-n', str(args.n),
+             '--variant', variant],
+            capture_output=True, text=True, check=True).stdout
+        print(f'{variant}: {float(output):.0f} байт RSS на получателя '
+              f'при {args.n} получателях')
+
+
+if __name__ == '__main__':
+    main()
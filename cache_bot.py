@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict, deque
+from time import monotonic, time
+
+CACHE_TTL = 1800
+CACHE_MAX_CHATS = 1000
+CACHE_MAX_HOMEWORKS = 50
+CACHE_MAX_HISTORY = 20
+
+
+class StatusCache:
+    """Кэш последних результатов check_response по чатам.
+
+    Команды бота читают данные только отсюда и не делают запросов к API.
+    Запись устаревает через ttl секунд после последнего опроса,
+    число чатов, работ в чате и длина истории ограничены.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_chats=CACHE_MAX_CHATS,
+                 max_homeworks=CACHE_MAX_HOMEWORKS,
+                 max_history=CACHE_MAX_HISTORY):
+        self.ttl = ttl
+        self.max_chats = max_chats
+        self.max_homeworks = max_homeworks
+        self.max_history = max_history
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, chat_id, homeworks):
+        """Сохраняет результат очередного опроса API для чата."""
+        chat_id = str(chat_id)
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.pop(chat_id, None)
+            if entry is None or self._expired(entry, now):
+                entry = {'homeworks': OrderedDict(),
+                         'history': deque(maxlen=self.max_history)}
+            for homework in homeworks:
+                self._merge(entry, homework)
+            entry['updated'] = now
+            self._entries[chat_id] = entry
+            self._evict(now)
+
+    def status(self, chat_id):
+        """Возвращает последние известные статусы работ или None."""
+        entry = self._get(chat_id)
+        if entry is None:
+            return None
+        return list(entry['homeworks'].values())
+
+    def history(self, chat_id):
+        """Возвращает историю смены статусов или None."""
+        entry = self._get(chat_id)
+        if entry is None:
+            return None
+        return list(entry['history'])
+
+    def _get(self, chat_id):
+        with self._lock:
+            entry = self._entries.get(str(chat_id))
+            if entry is not None and self._expired(entry, monotonic()):
+                del self._entries[str(chat_id)]
+                return None
+            return entry
+
+    def _merge(self, entry, homework):
+        name = homework.get('homework_name')
+        status = homework.get('status')
+        if name is None or status is None:
+            return
+        known = entry['homeworks'].pop(name, None)
+        entry['homeworks'][name] = dict(homework)
+        if len(entry['homeworks']) > self.max_homeworks:
+            entry['homeworks'].popitem(last=False)
+        if known is None or known.get('status') != status:
+            entry['history'].append({
+                'homework_name': name,
+                'status': status,
+                'date_updated': homework.get('date_updated'),
+                'received': int(time()),
+            })
+
+    def _expired(self, entry, now):
+        return now - entry['updated'] > self.ttl
+
+    def _evict(self, now):
+        # Записи упорядочены по времени обновления:
+        # устаревшие и самые старые всегда в начале.
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if (len(self._entries) <= self.max_chats
+                    and not self._expired(oldest, now)):
+                break
+            self._entries.popitem(last=False)
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = '\n\n'
+
+
+def split_message(message, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Режет слишком длинное сообщение на части не длиннее limit."""
+    return [message[i:i + limit]
+            for i in range(0, len(message), limit)] or ['']
+
+
+def pack_groups(messages, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Упаковывает сообщения в минимум текстов не длиннее limit.
+
+    Порядок сообщений сохраняется, части склеиваются через пустую строку.
+    Возвращает пары (текст, номера сообщений, начатых в этом тексте).
+    """
+    packed = []
+    current = ''
+    started = []
+    for number, message in enumerate(messages):
+        for position, part in enumerate(split_message(message, limit)):
+            if not current:
+                current = part
+            elif len(current) + len(DIGEST_SEPARATOR) + len(part) <= limit:
+                current += DIGEST_SEPARATOR + part
+            else:
+                packed.append((current, started))
+                current, started = part, []
+            if not position:
+                started.append(number)
+    if current:
+        packed.append((current, started))
+    return packed
+
+
+def pack_messages(messages, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Упаковывает сообщения в минимум текстов не длиннее limit."""
+    return [text for text, _ in pack_groups(messages, limit)]
+
+
+class Digest:
+    """Копит изменения статусов по чатам и отдаёт их пачками.
+
+    Окно открывается первым сообщением для чата; по истечении window
+    секунд все накопленные сообщения чата упаковываются в дайджест.
+    """
+
+    def __init__(self, window, limit=TELEGRAM_MESSAGE_LIMIT):
+        self.window = window
+        self.limit = limit
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, chat_id, message, updated=(), acks=(), now=None):
+        """Добавляет сообщение в окно чата.
+
+        updated — метки времени изменений, о которых сообщение,
+        acks — кому подтвердить его доставку.
+        """
+        now = monotonic() if now is None else now
+        with self._lock:
+            if chat_id not in self._pending:
+                self._pending[chat_id] = (now, [])
+            self._pending[chat_id][1].append((message, updated, acks))
+
+    def pop_due(self, now=None):
+        """Дайджесты чатов с истёкшим окном.
+
+        Возвращает четвёрки (chat_id, текст, updated, acks).
+        """
+        now = monotonic() if now is None else now
+        due = []
+        with self._lock:
+            # Чаты упорядочены по времени открытия окна.
+            while self._pending:
+                chat_id, (opened, messages) = next(
+                    iter(self._pending.items()))
+                if now - opened < self.window:
+                    break
+                del self._pending[chat_id]
+                due.append((chat_id, messages))
+        return self._pack(due)
+
+    def pop_all(self):
+        """Возвращает все накопленные сообщения независимо от окна."""
+        with self._lock:
+            due = [(chat_id, messages)
+                   for chat_id, (_, messages) in self._pending.items()]
+            self._pending.clear()
+        return self._pack(due)
+
+    def _pack(self, due):
+        packed = []
+        for chat_id, messages in due:
+            texts = [message for message, _, _ in messages]
+            for text, numbers in pack_groups(texts, self.limit):
+                updated = tuple(stamp for number in numbers
+                                for stamp in messages[number][1])
+                acks = tuple(name for number in numbers
+                             for name in messages[number][2])
+                packed.append((chat_id, text, updated, acks))
+        return packed
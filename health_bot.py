@@ -0,0 +1,115 @@
+import json
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+from urllib.parse import unquote, urlsplit
+
+from pipeline_bot import queue_gauges
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LIVENESS_TIMEOUT = 180
+
+
+class Health:
+    """Состояние бота для проверок живости и готовности.
+
+    Все ответы собираются из заранее посчитанных величин: списка
+    получателей по давности удачного опроса в TenantTable, гистограммы
+    задержек и счётчиков очередей, поэтому не зависят от числа
+    получателей.
+    """
+
+    def __init__(self, tenants, latency, queues=(), threads=(),
+                 liveness_timeout=LIVENESS_TIMEOUT):
+        self.tenants = tenants
+        self.latency = latency
+        self.queues = list(queues)
+        self.threads = list(threads)
+        self.liveness_timeout = liveness_timeout
+        self.ready = False
+        self._heartbeat = monotonic()
+
+    def beat(self):
+        """Отмечает, что основной цикл жив."""
+        self._heartbeat = monotonic()
+
+    def live(self):
+        """Жив ли основной цикл и потоки конвейера."""
+        age = monotonic() - self._heartbeat
+        return {'live': (age < self.liveness_timeout
+                         and all(thread.is_alive()
+                                 for thread in self.threads)),
+                'heartbeat_age': age}
+
+    def readiness(self):
+        """Готов ли бот опрашивать API и отправлять уведомления."""
+        return {'ready': self.ready and self.live()['live'],
+                'tenants': len(self.tenants)}
+
+    def summary(self):
+        """Общая сводка: живость, самый устаревший получатель, задержки."""
+        name, staleness = self.tenants.stalest(monotonic())
+        return dict(self.live(), **self.readiness(),
+                    stalest_tenant={'name': name, 'staleness': staleness},
+                    notification_latency=self.latency.snapshot(),
+                    queues=queue_gauges(self.queues))
+
+    def tenant(self, name):
+        """Состояние одного получателя или None."""
+        return self.tenants.state(name, monotonic())
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Отдаёт состояние бота в JSON.
+
+    /health — сводка, /health/live и /health/ready — проверки
+    (503, если не пройдены), /health/tenants/<name> — один получатель.
+    """
+
+    def do_GET(self):
+        """Обрабатывает GET-запрос."""
+        health = self.server.health
+        path = urlsplit(self.path).path.rstrip('/')
+        if path == '/health':
+            self._reply(HTTPStatus.OK, health.summary())
+        elif path == '/health/live':
+            body = health.live()
+            self._reply(HTTPStatus.OK if body['live']
+                        else HTTPStatus.SERVICE_UNAVAILABLE, body)
+        elif path == '/health/ready':
+            body = health.readiness()
+            self._reply(HTTPStatus.OK if body['ready']
+                        else HTTPStatus.SERVICE_UNAVAILABLE, body)
+        elif path.startswith('/health/tenants/'):
+            body = health.tenant(unquote(path[len('/health/tenants/'):]))
+            self._reply(HTTPStatus.NOT_FOUND if body is None
+                        else HTTPStatus.OK, body)
+        else:
+            self._reply(HTTPStatus.NOT_FOUND, None)
+
+    def log_message(self, format, *args):
+        """Пишет запросы в лог бота, а не в stderr."""
+        logger.debug(format, *args)
+
+    def _reply(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve_health(health, host, port):
+    """Запускает HTTP-сервер проверок в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), HealthHandler)
+    server.daemon_threads = True
+    server.health = health
+    threading.Thread(target=server.serve_forever, name='health',
+                     daemon=True).start()
+    logger.info(f'Проверки состояния доступны на http://{host}:{port}/health')
+    return server
@@ -1,15 +1,32 @@
 import logging
 import os
+import signal
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from functools import partial
 from http import HTTPStatus
-from time import sleep, time
+from time import monotonic
 
 import requests
 from dotenv import load_dotenv
-from telegram import Bot, TelegramError
+from telegram import TelegramError
+from telegram.ext import CommandHandler, Updater
 
+from cache_bot import StatusCache
+from digest_bot import Digest
+from health_bot import Health, serve_health
 from exception_bot import (KeyMissError, JSONError, TGError,
                            RequestError, HTTPStatusNotOK)
+from metrics_bot import LatencyHistogram
+from pipeline_bot import CLOSED, PAUSE, BoundedQueue, queue_gauges
+from record_bot import Recorder
+from sinks_bot import (FileSink, Notification, TelegramSink, Fanout,
+                       WebhookSink)
+from tenants_bot import (MAX_BACKOFF, TenantTable, chat_bots, chat_weights,
+                         load_cursors, load_tenants, save_cursors)
+from transport_bot import TelegramTransport, bot_id
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -17,15 +34,38 @@ logger.setLevel(logging.INFO)
 handler = logging.StreamHandler(stream=sys.stdout)
 handler.setFormatter(logging.Formatter(
     '%(asctime)s - %(lineno)d.%(levelname)s(%(funcName)s) - %(message)s'))
-logger.addHandler(handler)
+logging.getLogger().addHandler(handler)
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TELEGRAM_TOKENS = os.getenv('TELEGRAM_TOKENS')
+TEAM_CHAT_ID = os.getenv('TEAM_CHAT_ID')
+TELEGRAM_BOT = os.getenv('TELEGRAM_BOT')
+TEAM_BOT = os.getenv('TEAM_BOT')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+NOTIFY_FILE = os.getenv('NOTIFY_FILE')
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+CURSOR_FILE = os.getenv('CURSOR_FILE')
+RECORD_FILE = os.getenv('RECORD_FILE')
+OVERFLOW_POLICY = os.getenv('OVERFLOW_POLICY', 'drop_errors')
 
 RETRY_TIME = 600
+DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', 0))
 TIMEOUT_SERVER = 5
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', 8))
+TELEGRAM_SENDERS = int(os.getenv('TELEGRAM_SENDERS', 4))
+LONG_POLL_TIMEOUT = 10
+POLL_WORKERS = 4
+DRAIN_TIMEOUT = 20
+PARSE_QUEUE_SIZE = 100
+PAUSE_RECHECK = 1
+PUBLISH_TIMEOUT = 5
+GAUGES_INTERVAL = 60
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+HEALTH_HOST = os.getenv('HEALTH_HOST', '127.0.0.1')
+HEALTH_PORT = os.getenv('HEALTH_PORT')
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 HOMEWORK_VERDICT = {
@@ -34,31 +74,103 @@ HOMEWORK_VERDICT = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 
+RECORDER = Recorder(RECORD_FILE)
+
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegram чат."""
+    send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправляет сообщение в указанный Telegram чат."""
     try:
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID, text=message)
+            chat_id=chat_id, text=message)
     except TelegramError as e:
+        record(RECORDER.telegram, chat_id, message, False)
         raise TGError(
             f'Cбой при отправке сообщения "{message}" в Telegram.') from e
     else:
+        record(RECORDER.telegram, chat_id, message, True)
         logger.info('Удачная отправка сообщения')
 
 
+def record(write, *args):
+    """Пишет трафик в RECORD_FILE; сбой записи не мешает работе бота."""
+    try:
+        write(*args)
+    except Exception:
+        logger.warning('Не удалось записать трафик в RECORD_FILE.',
+                       exc_info=True)
+
+
+def build_sinks(bot, latency=None, ack=None):
+    """Собирает приёмники уведомлений по переменным окружения.
+    Задержка и подтверждение доставки считаются по основному чату,
+    и только он получает уведомления об ошибках.
+    """
+    send = partial(send_to_chat, bot)
+    sinks = [TelegramSink('telegram', send, policy=OVERFLOW_POLICY,
+                          workers=TELEGRAM_SENDERS, latency=latency,
+                          ack=ack, errors=True)]
+    if TEAM_CHAT_ID:
+        sinks.append(TelegramSink('team', send, chat_id=TEAM_CHAT_ID))
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink('webhook', WEBHOOK_URL))
+    if NOTIFY_FILE:
+        sinks.append(FileSink('file', NOTIFY_FILE))
+    return Fanout(sinks)
+
+
+def deliver(fanout, digest, notifications):
+    """Отправляет уведомления сразу или откладывает их в дайджест.
+    Места в очередях приёмников ждёт не дольше PUBLISH_TIMEOUT:
+    не поместившееся уведомление отбрасывается, и его изменения
+    запрашиваются повторно (см. TenantTable.ack).
+    """
+    for notification in notifications:
+        if digest is None:
+            fanout.publish(notification, PUBLISH_TIMEOUT)
+        else:
+            digest.add(notification.chat_id, notification.text,
+                       notification.updated, notification.acks)
+
+
+def flush_digest(fanout, digest, timeout, force=False):
+    """Отправляет дайджесты чатов, у которых истекло окно.
+    Ждёт места в очередях приёмников не дольше timeout: дайджест,
+    который не поместился, отбрасывается, и его изменения
+    запрашиваются повторно (см. TenantTable.ack).
+    """
+    if digest is None:
+        return
+    deadline = monotonic() + timeout
+    packed = digest.pop_all() if force else digest.pop_due()
+    for chat_id, text, updated, acks in packed:
+        fanout.publish(Notification(chat_id, text, updated=updated,
+                                    acks=acks),
+                       max(deadline - monotonic(), 0))
+
+
 def get_api_answer(current_timestamp):
     """Делает запрос к API-сервиса.
     В качестве параметра функция получает временную метку.
     В случае успешного запроса ответ API, преобразовав его
     из формата JSON к типам данных Python.
     """
+    return request_api(HEADERS, current_timestamp)
+
+
+def request_api(headers, current_timestamp):
+    """Делает запрос к API-сервиса с заголовками получателя."""
+    # Заголовки с токеном не попадают в тексты ошибок.
     request_value = {'url': ENDPOINT,
-                     'headers': HEADERS,
-                     'params': {'from_date': current_timestamp},
-                     'timeout': TIMEOUT_SERVER}
+                     'params': {'from_date': current_timestamp}}
+    response = homework = None
     try:
-        response = requests.get(**request_value)
+        response = requests.get(headers=headers, timeout=TIMEOUT_SERVER,
+                                **request_value)
         if response.status_code != HTTPStatus.OK:
             raise HTTPStatusNotOK()
         homework = response.json()
@@ -81,6 +193,9 @@ def get_api_answer(current_timestamp):
     else:
         logger.info('Ответ от сервера получен')
         return homework
+    finally:
+        if response is not None:
+            record(RECORDER.api, current_timestamp, response, homework)
 
 
 def check_response(response):
@@ -115,9 +230,276 @@ def parse_status(homework):
     return f'Изменился статус проверки работы "{homework_name}". {verdict}'
 
 
+def parse_date(date_updated):
+    """Переводит date_updated работы в Unix time.
+    Возвращает кортеж из одной метки или пустой, если даты нет.
+    """
+    try:
+        return (datetime.strptime(date_updated, DATE_FORMAT)
+                .replace(tzinfo=timezone.utc).timestamp(),)
+    except (TypeError, ValueError):
+        return ()
+
+
+def render_status(homeworks):
+    """Формирует ответ на команду /status."""
+    if not homeworks:
+        return 'Статусы работ пока не менялись.'
+    return '\n'.join(
+        f'"{homework["homework_name"]}": '
+        f'{HOMEWORK_VERDICT.get(homework["status"], homework["status"])}'
+        for homework in homeworks)
+
+
+def render_history(history):
+    """Формирует ответ на команду /history."""
+    if not history:
+        return 'История изменений пуста.'
+    return '\n'.join(
+        f'{record["date_updated"] or "-"} "{record["homework_name"]}": '
+        f'{HOMEWORK_VERDICT.get(record["status"], record["status"])}'
+        for record in history)
+
+
+def status_command(update, context):
+    """Отвечает на /status из кэша, без запроса к API."""
+    cache = context.bot_data['status_cache']
+    homeworks = cache.status(update.effective_chat.id)
+    if homeworks is None:
+        update.effective_message.reply_text('Нет актуальных данных.')
+    else:
+        update.effective_message.reply_text(render_status(homeworks))
+
+
+def history_command(update, context):
+    """Отвечает на /history из кэша, без запроса к API."""
+    cache = context.bot_data['status_cache']
+    history = cache.history(update.effective_chat.id)
+    if history is None:
+        update.effective_message.reply_text('Нет актуальных данных.')
+    else:
+        update.effective_message.reply_text(render_history(history))
+
+
+def start_commands(bot, cache):
+    """Запускает long-polling getUpdates для команд бота."""
+    updater = Updater(bot=bot, workers=1)
+    updater.dispatcher.bot_data['status_cache'] = cache
+    updater.dispatcher.add_handler(CommandHandler('status', status_command))
+    updater.dispatcher.add_handler(CommandHandler('history', history_command))
+    updater.start_polling(timeout=LONG_POLL_TIMEOUT, drop_pending_updates=True)
+    logger.info('Обработка команд запущена')
+    return updater
+
+
+def stop_commands(updaters):
+    """Останавливает long-polling всех ботов."""
+    for updater in updaters:
+        updater.stop()
+
+
+def telegram_tokens():
+    """Токены ботов: TELEGRAM_TOKENS через запятую или TELEGRAM_TOKEN."""
+    if TELEGRAM_TOKENS:
+        return [token.strip() for token in TELEGRAM_TOKENS.split(',')
+                if token.strip()]
+    return [TELEGRAM_TOKEN]
+
+
+def default_bot():
+    """Бот основного чата: TELEGRAM_BOT или первый из токенов."""
+    token = telegram_tokens()[0]
+    return TELEGRAM_BOT or (bot_id(token) if token else None)
+
+
 def check_tokens():
     """Проверяет доступность переменных окружения."""
-    return TELEGRAM_TOKEN and TELEGRAM_CHAT_ID and PRACTICUM_TOKEN
+    return ((TELEGRAM_TOKEN or TELEGRAM_TOKENS) and TELEGRAM_CHAT_ID
+            and PRACTICUM_TOKEN)
+
+
+def report_error(fanout, chat_id, error):
+    """Логирует сбой и отправляет уведомление об ошибке."""
+    message = (f'Сбой в работе программы. Ошибка:{error}')
+    logger.error(message, exc_info=True)
+    fanout.publish(Notification(chat_id, message, 'error'), PUBLISH_TIMEOUT)
+
+
+def fetch_tenant(tenants, parse_queue, fanout, index, tenant,
+                 current_timestamp):
+    """Стадия опроса: запрашивает API и передаёт ответ на разбор.
+    Если очередь разбора заполнена, поток ждёт места, и новые
+    опросы не запускаются.
+    """
+    headers = {'Authorization': f'OAuth {tenant["practicum_token"]}'}
+    queued = False
+    try:
+        response = request_api(headers, current_timestamp)
+        queued = parse_queue.put((index, tenant, current_timestamp, response))
+    except Exception as error:
+        report_error(fanout, tenant['chat_id'], error)
+    finally:
+        if not queued:
+            tenants.complete(index, current_timestamp, None, False,
+                             monotonic())
+
+
+def parse_tenant(tenant, current_timestamp, response, cache, fanout):
+    """Стадия разбора ответа API одного получателя.
+    Возвращает метку времени для следующего запроса, статус
+    последней работы, признак успешного опроса и уведомления
+    об изменениях статусов.
+    """
+    chat_id = tenant['chat_id']
+    try:
+        correct_response = check_response(response)
+        logger.info('Получен корректный ответ от API')
+        cache.update(chat_id, correct_response)
+        if len(correct_response):
+            return (response['current_date'],
+                    correct_response[-1].get('status'), True,
+                    [Notification(chat_id, parse_status(hw),
+                                  updated=parse_date(hw.get('date_updated')),
+                                  acks=(tenant['name'],))
+                     for hw in correct_response])
+        logger.info('Обновлений нет')
+    except KeyMissError:
+        logger.error('Сбой в работе программы.', exc_info=True)
+    except Exception as error:
+        report_error(fanout, chat_id, error)
+    else:
+        return current_timestamp, None, True, []
+    return current_timestamp, None, False, []
+
+
+def run_parser(parse_queue, tenants, cache, fanout, digest):
+    """Поток стадии разбора: читает очередь до её закрытия.
+    Уведомления отправляются после complete, чтобы их подтверждения
+    не опередили учёт в TenantTable.
+    """
+    while True:
+        item = parse_queue.get()
+        if item is CLOSED:
+            return
+        index, tenant, current_timestamp, response = item
+        result = current_timestamp, None, False, []
+        try:
+            result = parse_tenant(tenant, current_timestamp, response,
+                                  cache, fanout)
+        finally:
+            *outcome, notifications = result
+            tenants.complete(index, *outcome, monotonic(),
+                             len(notifications))
+        deliver(fanout, digest, notifications)
+
+
+def schedule_polls(tenants, executor, futures, parse_queue, fanout, wakeup):
+    """Запускает опросы, срок которых наступил.
+    Пока очередь разбора заполнена или все места для опросов заняты,
+    опрос приостанавливается. Возвращает незавершённые опросы
+    и признак паузы.
+    """
+    futures = {future for future in futures if not future.done()}
+    capacity = POLL_WORKERS * 2 - len(futures)
+    if parse_queue.full() or capacity <= 0:
+        return futures, True
+    for index, tenant, current_timestamp in tenants.pop_due(
+            monotonic(), capacity):
+        future = executor.submit(fetch_tenant, tenants, parse_queue, fanout,
+                                 index, tenant, current_timestamp)
+        future.add_done_callback(lambda _: wakeup.set())
+        futures.add(future)
+    return futures, False
+
+
+def default_tenant():
+    """Получатель, заданный переменными окружения."""
+    return {'name': 'default',
+            'practicum_token': PRACTICUM_TOKEN,
+            'chat_id': TELEGRAM_CHAT_ID,
+            'bot': default_bot()}
+
+
+def chat_routes(configs):
+    """Боты чатов получателей и общего чата команды.
+    Общий чат пишет TEAM_BOT или бот основного чата.
+    """
+    routes = chat_bots(configs)
+    team_bot = TEAM_BOT or default_bot()
+    if not TEAM_CHAT_ID or not team_bot:
+        return routes
+    if routes.setdefault(str(TEAM_CHAT_ID), team_bot) != team_bot:
+        raise ValueError(f'За чатом {TEAM_CHAT_ID} закреплены разные боты.')
+    return routes
+
+
+def reload_tenants(tenants, fanout, transport):
+    """Перечитывает набор получателей, не прерывая идущие опросы."""
+    try:
+        configs = load_tenants(TENANTS_FILE, default_tenant())
+        transport.set_routes(chat_routes(configs))
+    except Exception:
+        logger.error('Не удалось перечитать получателей.', exc_info=True)
+        return
+    added, removed, changed = tenants.apply(configs, monotonic())
+    fanout.set_weights(chat_weights(configs))
+    logger.info(f'Получатели обновлены: добавлено {added}, '
+                f'удалено {removed}, изменено {changed}')
+
+
+def install_signal_handlers(wakeup, stopping, reloading):
+    """SIGTERM и SIGINT завершают работу, SIGHUP перечитывает настройки."""
+    def stop(signum, frame):
+        stopping.set()
+        wakeup.set()
+
+    def reload(signum, frame):
+        reloading.set()
+        wakeup.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, reload)
+
+
+def log_gauges(queues):
+    """Логирует глубину очередей и счётчики сброса нагрузки."""
+    for name, gauges in queue_gauges(queues).items():
+        logger.info(f'Очередь {name}: {gauges}')
+
+
+def start_health(health):
+    """Запускает HTTP-проверки состояния, если задан HEALTH_PORT."""
+    if not HEALTH_PORT:
+        return None
+    return serve_health(health, HEALTH_HOST, int(HEALTH_PORT))
+
+
+def drain(executor, futures, parse_queue, parser, updaters, fanout, digest,
+          tenants, health, server):
+    """Завершает работу не дольше DRAIN_TIMEOUT секунд.
+    Дожидается идущих опросов и их разбора, отправляет накопленные
+    сообщения и сохраняет метки времени получателей.
+    """
+    deadline = monotonic() + DRAIN_TIMEOUT
+    health.ready = False
+    logger.info('Завершение работы')
+    stopper = threading.Thread(target=stop_commands, args=(updaters,),
+                               daemon=True)
+    stopper.start()
+    executor.shutdown(wait=False, cancel_futures=True)
+    wait(futures, timeout=max(deadline - monotonic(), 0))
+    parse_queue.close()
+    parser.join(max(deadline - monotonic(), 0))
+    flush_digest(fanout, digest, max(deadline - monotonic(), 0), force=True)
+    fanout.close(max(deadline - monotonic(), 0))
+    save_cursors(CURSOR_FILE, tenants.cursors())
+    RECORDER.close()
+    stopper.join(max(deadline - monotonic(), 0))
+    if server is not None:
+        server.shutdown()
+    logger.info('Работа завершена')
 
 
 def main():
@@ -125,29 +507,56 @@ def main():
     if not check_tokens():
         logger.critical('Отсутствуют обязательные переменные окружения')
         sys.exit('Отсутствуют обязательные переменные окружения')
-    bot = Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time())
+    transport = TelegramTransport(telegram_tokens(), TELEGRAM_POOL_SIZE)
+    # Запись живёт дольше самого длинного интервала опроса при сбоях.
+    cache = StatusCache(ttl=MAX_BACKOFF + RETRY_TIME)
+    digest = Digest(DIGEST_WINDOW) if DIGEST_WINDOW > 0 else None
+    tenants = TenantTable(RETRY_TIME, HOMEWORK_VERDICT,
+                          load_cursors(CURSOR_FILE))
+    latency = LatencyHistogram()
+    configs = load_tenants(TENANTS_FILE, default_tenant())
+    transport.set_routes(chat_routes(configs))
+    tenants.apply(configs, monotonic())
+    fanout = build_sinks(transport, latency, tenants.ack)
+    fanout.set_weights(chat_weights(configs))
+    parse_queue = BoundedQueue('parse', PARSE_QUEUE_SIZE, PAUSE)
+    parser = threading.Thread(
+        target=run_parser, name='parser', daemon=True,
+        args=(parse_queue, tenants, cache, fanout, digest))
+    parser.start()
+    queues = [parse_queue] + fanout.queues
+    health = Health(tenants, latency, queues, [parser] + fanout.threads)
+    server = start_health(health)
+    # Потоки команд не фоновые, поэтому запускаются, когда всё, что может
+    # упасть при старте, уже проверено.
+    updaters = [start_commands(bot, cache) for bot in transport.bots]
+    wakeup, stopping, reloading = (threading.Event() for _ in range(3))
+    install_signal_handlers(wakeup, stopping, reloading)
+    executor = ThreadPoolExecutor(POLL_WORKERS, thread_name_prefix='poll')
+    futures = set()
+    next_gauges = monotonic() + GAUGES_INTERVAL
+    health.ready = True
     logger.info('Инициализация прошла успешно')
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            correct_response = check_response(response)
-            logger.info('Получен корректный ответ от API')
-            if len(correct_response):
-                send_message(bot, parse_status(correct_response.pop()))
-                current_timestamp = response['current_date']
-            else:
-                logger.info('Обновлений нет')
-        except KeyMissError:
-            logger.error('Сбой в работе программы.', exc_info=True)
-        except TGError:
-            logger.error('Сбой в работе программы.', exc_info=True)
-        except Exception as error:
-            message = (f'Сбой в работе программы. Ошибка:{error}')
-            logger.error(message, exc_info=True)
-            send_message(bot, message)
-        finally:
-            sleep(RETRY_TIME)
+    while not stopping.is_set():
+        health.beat()
+        if reloading.is_set():
+            reloading.clear()
+            reload_tenants(tenants, fanout, transport)
+        futures, paused = schedule_polls(tenants, executor, futures,
+                                         parse_queue, fanout, wakeup)
+        flush_digest(fanout, digest, PAUSE_RECHECK)
+        if monotonic() >= next_gauges:
+            log_gauges(queues)
+            next_gauges = monotonic() + GAUGES_INTERVAL
+        timeout = (PAUSE_RECHECK if paused
+                   else min(tenants.seconds_until_next(monotonic()),
+                            GAUGES_INTERVAL))
+        if digest is not None:
+            timeout = min(timeout, digest.window)
+        wakeup.wait(timeout)
+        wakeup.clear()
+    drain(executor, futures, parse_queue, parser, updaters, fanout, digest,
+          tenants, health, server)
 
 
 if __name__ == '__main__':
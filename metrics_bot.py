@@ -0,0 +1,54 @@
+import threading
+from bisect import bisect_left
+
+# Верхние границы корзин: от 1 мс до ~12 суток с шагом √2.
+LATENCY_BOUNDS = tuple(0.001 * 2 ** (i / 2) for i in range(61))
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами.
+
+    Запись и расчёт перцентилей не зависят от числа наблюдений;
+    перцентиль оценивается верхней границей корзины.
+    """
+
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Учитывает одно наблюдение."""
+        seconds = max(seconds, 0.0)
+        with self._lock:
+            self.counts[bisect_left(self.bounds, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """Оценка перцентиля (fraction от 0 до 1) или None без данных."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = fraction * self.count
+            seen = 0
+            for position, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    if position == len(self.bounds):
+                        return self.max
+                    return min(self.bounds[position], self.max)
+            return self.max
+
+    def snapshot(self):
+        """Сводка: число наблюдений, среднее, p50/p95/p99 и максимум."""
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'p50': self.percentile(0.5),
+                'p95': self.percentile(0.95),
+                'p99': self.percentile(0.99),
+                'max': self.max if self.count else None}
@@ -0,0 +1,282 @@
+import threading
+from collections import OrderedDict, deque
+from time import monotonic
+
+from digest_bot import DIGEST_SEPARATOR, TELEGRAM_MESSAGE_LIMIT
+from metrics_bot import LatencyHistogram
+
+DROP = 'drop'
+PAUSE = 'pause'
+DROP_ERRORS = 'drop_errors'
+COALESCE = 'coalesce'
+POLICIES = (DROP, PAUSE, DROP_ERRORS, COALESCE)
+LANES = ('status', 'error')
+
+CLOSED = object()
+
+
+class BoundedQueue:
+    """Ограниченная очередь между стадиями с политикой переполнения.
+
+    - drop: новое сообщение отбрасывается;
+    - pause: производитель ждёт места, так давление доходит до опроса;
+    - drop_errors: сначала отбрасываются уведомления об ошибках
+      (новое или самое старое в очереди), иначе как pause;
+    - coalesce: статус склеивается с ожидающим статусом того же чата,
+      иначе как drop_errors.
+
+    Глубина очереди и счётчики доступны через gauges().
+    """
+
+    def __init__(self, name, maxsize, policy=PAUSE,
+                 limit=TELEGRAM_MESSAGE_LIMIT):
+        if policy not in POLICIES:
+            raise ValueError(f'Неизвестная политика переполнения: {policy}')
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.limit = limit
+        self.dropped = 0
+        self.coalesced = 0
+        self.paused = 0
+        self.high_watermark = 0
+        self._items = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    def full(self):
+        """Заполнена ли очередь."""
+        return self._size >= self.maxsize
+
+    def put(self, item, timeout=None):
+        """Ставит элемент в очередь по политике переполнения.
+
+        Возвращает False, если элемент отброшен.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    self.dropped += 1
+                    return False
+                if self._size < self.maxsize:
+                    self._append(item)
+                    return True
+                shed = self._shed(item)
+                if shed is not None:
+                    return shed
+                if not waited:
+                    self.paused += 1
+                    waited = True
+                remaining = (None if deadline is None
+                             else deadline - monotonic())
+                if remaining is not None and remaining <= 0:
+                    self.dropped += 1
+                    return False
+                self._cond.wait(remaining)
+
+    def get(self, timeout=None):
+        """Забирает элемент; после close и опустошения вернёт CLOSED."""
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._ready() or (self._closed
+                                              and not self._size),
+                    timeout):
+                return None
+            if not self._ready():
+                return CLOSED
+            item = self._pop()
+            self._size -= 1
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Запрещает новые элементы; уже поставленные будут выданы."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def gauges(self):
+        """Текущая глубина очереди и счётчики политики."""
+        return {'depth': self._size, 'maxsize': self.maxsize,
+                'high_watermark': self.high_watermark,
+                'dropped': self.dropped, 'coalesced': self.coalesced,
+                'paused': self.paused}
+
+    def _ready(self):
+        # Есть ли элемент, который можно выдать прямо сейчас.
+        return self._size
+
+    def _append(self, item):
+        self._store(item)
+        self._size += 1
+        self.high_watermark = max(self.high_watermark, self._size)
+        self._cond.notify_all()
+
+    def _shed(self, item):
+        if self.policy == DROP:
+            self.dropped += 1
+            return False
+        if self.policy == PAUSE:
+            return None
+        kind = getattr(item, 'kind', None)
+        if self.policy == COALESCE and kind == 'status':
+            if self._coalesce(item):
+                self.coalesced += 1
+                return True
+        if kind == 'error':
+            self.dropped += 1
+            return False
+        if self._evict_error():
+            self._size -= 1
+            self.dropped += 1
+            self._append(item)
+            return True
+        return None
+
+    def _merge(self, queued, item):
+        # Склеенное уведомление или None, если не помещается.
+        if (getattr(queued, 'kind', None) != 'status'
+                or queued.chat_id != item.chat_id):
+            return None
+        text = queued.text + DIGEST_SEPARATOR + item.text
+        if len(text) > self.limit:
+            return None
+        return queued._replace(text=text,
+                               updated=queued.updated + item.updated,
+                               acks=queued.acks + item.acks)
+
+    def _store(self, item):
+        self._items.append(item)
+
+    def _pop(self):
+        return self._items.popleft()
+
+    def _evict_error(self):
+        for queued in self._items:
+            if getattr(queued, 'kind', None) == 'error':
+                self._items.remove(queued)
+                return True
+        return False
+
+    def _coalesce(self, item):
+        for position, queued in enumerate(self._items):
+            merged = self._merge(queued, item)
+            if merged is not None:
+                self._items[position] = merged
+                return True
+        return False
+
+
+class LaneQueue(BoundedQueue):
+    """Очередь уведомлений с полосами приоритета.
+
+    Полоса выбирается по kind уведомления; полосы обслуживаются строго
+    по порядку lanes, так что статусы работ всегда уходят раньше
+    сообщений об ошибках. Внутри полосы чаты обслуживаются взвешенным
+    круговым обходом (веса в weights, по умолчанию 1), чтобы один
+    многословный чат не задерживал остальные. Для каждой полосы
+    считается время ожидания в очереди.
+
+    При exclusive=True чат, выданный get, не выдаётся снова до вызова
+    done: несколько потоков могут читать очередь, сохраняя порядок
+    сообщений в каждом чате, и медленный чат не мешает остальным.
+    """
+
+    def __init__(self, name, maxsize, policy=PAUSE, lanes=LANES,
+                 exclusive=False, **kwargs):
+        super().__init__(name, maxsize, policy, **kwargs)
+        self.lanes = lanes
+        self.exclusive = exclusive
+        self.weights = {}
+        self._busy = set()
+        self._lanes = {lane: OrderedDict() for lane in lanes}
+        self._credits = {lane: {} for lane in lanes}
+        self.latency = {lane: LatencyHistogram() for lane in lanes}
+
+    def gauges(self):
+        """Показатели очереди и каждой полосы."""
+        with self._cond:
+            gauges = super().gauges()
+            gauges['lanes'] = {
+                lane: dict(self.latency[lane].snapshot(),
+                           depth=sum(map(len, self._lanes[lane].values())))
+                for lane in self.lanes}
+        return gauges
+
+    def done(self, item):
+        """Отпускает чат элемента, выданного get при exclusive=True."""
+        with self._cond:
+            self._busy.discard(item.chat_id)
+            self._cond.notify_all()
+
+    def _ready(self):
+        return any(self._available(lane) for lane in self.lanes)
+
+    def _available(self, lane):
+        return any(chat_id not in self._busy for chat_id in self._lanes[lane])
+
+    def _lane(self, item):
+        kind = getattr(item, 'kind', None)
+        return kind if kind in self._lanes else self.lanes[-1]
+
+    def _store(self, item):
+        chats = self._lanes[self._lane(item)]
+        chats.setdefault(item.chat_id, deque()).append((item, monotonic()))
+
+    def _pop(self):
+        lane = next(lane for lane in self.lanes if self._available(lane))
+        chats = self._lanes[lane]
+        credits = self._credits[lane]
+        # Плавный взвешенный круговой обход (smooth weighted round-robin)
+        # среди чатов, которые сейчас никто не обслуживает.
+        total = 0
+        chosen = None
+        for chat_id in chats:
+            if chat_id in self._busy:
+                continue
+            weight = self.weights.get(chat_id, 1)
+            total += weight
+            credits[chat_id] = credits.get(chat_id, 0) + weight
+            if chosen is None or credits[chat_id] > credits[chosen]:
+                chosen = chat_id
+        credits[chosen] -= total
+        item, queued_at = chats[chosen].popleft()
+        if not chats[chosen]:
+            del chats[chosen]
+            del credits[chosen]
+        if self.exclusive:
+            self._busy.add(chosen)
+        self.latency[lane].record(monotonic() - queued_at)
+        return item
+
+    def _evict_error(self):
+        chats = self._lanes.get('error')
+        if not chats:
+            return False
+        oldest = min(chats, key=lambda chat_id: chats[chat_id][0][1])
+        chats[oldest].popleft()
+        if not chats[oldest]:
+            del chats[oldest]
+            self._credits['error'].pop(oldest, None)
+        return True
+
+    def _coalesce(self, item):
+        queued = self._lanes['status'].get(item.chat_id)
+        if not queued:
+            return False
+        merged = self._merge(queued[-1][0], item)
+        if merged is None:
+            return False
+        queued[-1] = merged, queued[-1][1]
+        return True
+
+
+def queue_gauges(queues):
+    """Показатели набора очередей по именам."""
+    return {queue.name: queue.gauges() for queue in queues}
@@ -0,0 +1,78 @@
+import json
+import threading
+from time import time
+
+RECORD_API = 'api'
+RECORD_TELEGRAM = 'tg'
+
+
+class Recorder:
+    """Дописывает сырой трафик API и Telegram в файл JSON Lines.
+
+    Каждая строка — компактный JSON: k — тип записи, t — время.
+    Для API: f — from_date, s — код ответа, b — тело ответа
+    (или r — текст, если тело не JSON). Для Telegram: c — чат,
+    x — текст, ok — удалась ли отправка. Файл открывается при первой
+    записи и только дописывается; без path или после close запись
+    отключена.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def api(self, from_date, response, body=None):
+        """Записывает ответ API.
+
+        body — уже разобранное тело ответа, чтобы не разбирать его снова.
+        """
+        if not self.path:
+            return
+        record = {'k': RECORD_API, 't': time(), 'f': from_date,
+                  's': response.status_code}
+        if body is not None:
+            record['b'] = body
+        else:
+            try:
+                record['b'] = response.json()
+            except ValueError:
+                record['r'] = response.text
+        self._write(record)
+
+    def telegram(self, chat_id, text, ok):
+        """Записывает вызов sendMessage."""
+        if not self.path:
+            return
+        self._write({'k': RECORD_TELEGRAM, 't': time(), 'c': chat_id,
+                     'x': text, 'ok': ok})
+
+    def close(self):
+        """Закрывает файл записи; дальнейшие записи отбрасываются."""
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            if self._closed:
+                return
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+
+def read_records(path, kind=None):
+    """Читает записи из файла, при необходимости только одного типа."""
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if kind is None or record['k'] == kind:
+                yield record
@@ -0,0 +1,54 @@
+"""Прогон записанных ответов API через check_response и parse_status.
+
+Запуск: python replay_bot.py RECORD_FILE [--repeat N]
+
+Записи читаются в память заранее, поэтому замер показывает скорость
+разбора ответов без сети и диска.
+"""
+import argparse
+from collections import Counter
+from http import HTTPStatus
+from time import perf_counter
+
+from homework import check_response, parse_status
+from record_bot import RECORD_API, read_records
+
+
+def replay(records, repeat=1):
+    """Прогоняет ответы API через разбор, возвращает статистику."""
+    stats = Counter()
+    started = perf_counter()
+    for _ in range(repeat):
+        for record in records:
+            stats['responses'] += 1
+            if record['s'] != HTTPStatus.OK or 'b' not in record:
+                stats['http_errors'] += 1
+                continue
+            try:
+                for homework in check_response(record['b']):
+                    parse_status(homework)
+                    stats['homeworks'] += 1
+            except Exception as error:
+                stats[type(error).__name__] += 1
+    stats['seconds'] = perf_counter() - started
+    return stats
+
+
+def main():
+    """Разбирает аргументы и печатает результат прогона."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='файл, записанный через RECORD_FILE')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='сколько раз прогнать записи')
+    args = parser.parse_args()
+    records = list(read_records(args.path, RECORD_API))
+    stats = replay(records, args.repeat)
+    seconds = stats.pop('seconds') or 1e-9
+    for key, value in sorted(stats.items()):
+        print(f'{key}: {value}')
+    print(f'ответов в секунду: {stats["responses"] / seconds:.0f}')
+    print(f'работ в секунду: {stats["homeworks"] / seconds:.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import json
+import logging
+import threading
+from collections import namedtuple
+from time import monotonic, sleep, time
+
+import requests
+
+from pipeline_bot import CLOSED, DROP, LaneQueue
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SINK_QUEUE_SIZE = 1000
+SINK_TIMEOUT = 5
+ERROR_PAUSE = 1
+
+# updated — время изменения статусов (date_updated, Unix time),
+# о которых сообщает уведомление; acks — имена получателей, которым
+# основной приёмник подтверждает доставку (по одному на изменение).
+Notification = namedtuple('Notification', 'chat_id text kind updated acks',
+                          defaults=('status', (), ()))
+
+
+def _payload(notification):
+    # Служебные acks наружу не отдаются.
+    payload = notification._asdict()
+    del payload['acks']
+    return payload
+
+
+class Sink:
+    """Приёмник уведомлений с собственной очередью и потоком доставки.
+
+    Ошибка доставки в одном приёмнике не задевает остальные. Очередь
+    разбита на полосы приоритета (см. LaneQueue): статусы работ
+    доставляются раньше сообщений об ошибках. Что делать при
+    переполнении, задаёт policy: по умолчанию уведомление отбрасывается,
+    чтобы медленный приёмник не задерживал остальные и цикл опроса.
+
+    При workers > 1 доставка идёт параллельно в workers потоков:
+    каждый поток сам берёт из очереди следующий свободный чат, и пока
+    уведомление чата доставляется, другие уведомления этого чата ждут.
+    Так порядок сообщений в чате сохраняется, а медленный чат занимает
+    только один поток. Если передан latency, в него пишется задержка
+    от изменения статуса до доставки уведомления. Если передан ack,
+    он вызывается как ack(notification.acks, ok) после доставки или
+    отказа от неё.
+
+    Уведомления об ошибках касаются одного получателя, поэтому
+    приёмник получает их, только если создан с errors=True.
+    """
+
+    def __init__(self, name, maxsize=SINK_QUEUE_SIZE, policy=DROP,
+                 workers=1, latency=None, ack=None, errors=False):
+        self.name = name
+        self.errors = errors
+        self.sent = 0
+        self.failed = 0
+        self.latency = latency
+        self.ack = ack
+        self.queue = LaneQueue(f'sink-{name}', maxsize, policy,
+                               exclusive=True)
+        self._counters_lock = threading.Lock()
+        self.threads = [threading.Thread(
+            target=self._run, daemon=True,
+            name=f'sink-{name}-{number}' if workers > 1 else f'sink-{name}')
+            for number in range(max(workers, 1))]
+
+    def start(self):
+        """Запускает потоки доставки."""
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def put(self, notification, timeout=None):
+        """Ставит уведомление в очередь по политике переполнения.
+
+        Ждёт места не дольше timeout, если политика велит ждать.
+        """
+        if self.queue.put(notification, timeout):
+            return True
+        logger.warning(f'Очередь приёмника {self.name} переполнена, '
+                       'уведомление отброшено')
+        self._acknowledge(notification, False)
+        return False
+
+    def close(self, timeout=None):
+        """Дожидается доставки очереди и останавливает потоки."""
+        self.queue.close()
+        deadline = None if timeout is None else monotonic() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None
+                        else max(deadline - monotonic(), 0))
+        if any(thread.is_alive() for thread in self.threads):
+            logger.warning(f'Приёмник {self.name} не успел разобрать очередь')
+
+    def deliver(self, notification):
+        """Доставляет одно уведомление."""
+        raise NotImplementedError
+
+    def route(self, notification):
+        """Чат, в который уйдёт уведомление."""
+        return notification.chat_id
+
+    def _run(self):
+        while True:
+            try:
+                notification = self.queue.get()
+                if notification is CLOSED:
+                    return
+                try:
+                    self._deliver(notification)
+                finally:
+                    self.queue.done(notification)
+            except Exception:
+                # Поток доставки не должен умирать: иначе очередь встанет,
+                # а производители будут ждать места вечно.
+                logger.error(f'Сбой потока приёмника {self.name}.',
+                             exc_info=True)
+                sleep(ERROR_PAUSE)
+
+    def _deliver(self, notification):
+        try:
+            self.deliver(notification)
+        except Exception:
+            with self._counters_lock:
+                self.failed += 1
+            logger.error(f'Сбой доставки в приёмник {self.name}.',
+                         exc_info=True)
+            self._acknowledge(notification, False)
+        else:
+            with self._counters_lock:
+                self.sent += 1
+            if self.latency is not None:
+                delivered = time()
+                for updated in notification.updated:
+                    self.latency.record(delivered - updated)
+            self._acknowledge(notification, True)
+
+    def _acknowledge(self, notification, ok):
+        if self.ack is not None and notification.acks:
+            self.ack(notification.acks, ok)
+
+
+class TelegramSink(Sink):
+    """Отправляет уведомления в Telegram.
+
+    Если задан chat_id, все уведомления уходят в этот чат
+    (например, общий чат команды), иначе — в чат уведомления.
+    """
+
+    def __init__(self, name, send, chat_id=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.send = send
+        self.chat_id = chat_id
+
+    def deliver(self, notification):
+        """Отправляет уведомление через функцию send."""
+        self.send(self.route(notification), notification.text)
+
+    def route(self, notification):
+        """Общий чат приёмника или чат уведомления."""
+        return self.chat_id or notification.chat_id
+
+
+class WebhookSink(Sink):
+    """Отправляет уведомления POST-запросом в формате JSON."""
+
+    def __init__(self, name, url, timeout=SINK_TIMEOUT, **kwargs):
+        super().__init__(name, **kwargs)
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, notification):
+        """Отправляет уведомление на webhook."""
+        response = requests.post(self.url, json=_payload(notification),
+                                 timeout=self.timeout)
+        response.raise_for_status()
+
+
+class FileSink(Sink):
+    """Дописывает уведомления в файл, по одному JSON на строку."""
+
+    def __init__(self, name, path, **kwargs):
+        super().__init__(name, **kwargs)
+        self.path = path
+
+    def deliver(self, notification):
+        """Дописывает уведомление в файл."""
+        record = dict(_payload(notification), time=int(time()))
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class Fanout:
+    """Рассылает каждое уведомление во все приёмники."""
+
+    def __init__(self, sinks):
+        # Приёмники, которые могут придержать отправителя, идут последними,
+        # чтобы не задерживать остальных.
+        self.sinks = [sink.start() for sink in sorted(
+            sinks, key=lambda sink: sink.queue.policy != DROP)]
+
+    def set_weights(self, weights):
+        """Задаёт веса чатов для справедливой очереди приёмников."""
+        for sink in self.sinks:
+            sink.queue.weights = weights
+
+    @property
+    def threads(self):
+        """Потоки доставки всех приёмников."""
+        return [thread for sink in self.sinks for thread in sink.threads]
+
+    @property
+    def queues(self):
+        """Очереди всех приёмников."""
+        return [sink.queue for sink in self.sinks]
+
+    def publish(self, notification, timeout=None):
+        """Ставит уведомление в очереди всех приёмников.
+
+        Уведомление об ошибке получают только приёмники с errors=True.
+        Вместе все приёмники ждут места не дольше timeout.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        for sink in self.sinks:
+            if notification.kind == 'error' and not sink.errors:
+                continue
+            sink.put(notification, None if deadline is None
+                     else max(deadline - monotonic(), 0))
+
+    def close(self, timeout=None):
+        """Дожидается доставки во все приёмники, не дольше timeout."""
+        deadline = None if timeout is None else monotonic() + timeout
+        for sink in self.sinks:
+            sink.close(None if deadline is None
+                       else max(deadline - monotonic(), 0))
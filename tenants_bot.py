@@ -0,0 +1,380 @@
+import heapq
+import json
+import os
+import threading
+from array import array
+from math import ceil, isfinite
+from time import time
+
+TENANT_FIELDS = ('name', 'practicum_token', 'chat_id')
+MAX_BACKOFF = 3600
+
+ACTIVE = 1
+RUNNING = 2
+REWIND = 4
+
+
+def load_tenants(path=None, default=None):
+    """Читает список получателей из JSON-файла.
+
+    Файл содержит список объектов с ключами name, practicum_token
+    и chat_id; необязательный weight (положительное число) задаёт долю
+    чата в очереди отправки, необязательный bot — id бота (часть токена
+    до двоеточия), который пишет в чат. Если путь не задан,
+    возвращается default.
+    """
+    if not path:
+        return {default['name']: default} if default else {}
+    with open(path, encoding='utf-8') as file:
+        tenants = json.load(file)
+    if not isinstance(tenants, list):
+        raise TypeError(f'В {path} ожидается список получателей.')
+    result = {}
+    for tenant in tenants:
+        missing = [field for field in TENANT_FIELDS if not tenant.get(field)]
+        if missing:
+            raise KeyError(f'У получателя {tenant} нет полей {missing}.')
+        result[tenant['name']] = {field: tenant[field]
+                                  for field in TENANT_FIELDS}
+        result[tenant['name']]['weight'] = check_weight(
+            tenant.get('weight', 1), tenant['name'])
+        if tenant.get('bot') is not None:
+            result[tenant['name']]['bot'] = str(tenant['bot'])
+    return result
+
+
+def check_weight(weight, name):
+    """Проверяет, что вес получателя — положительное конечное число."""
+    if (isinstance(weight, bool) or not isinstance(weight, (int, float))
+            or not (weight > 0 and isfinite(weight))):
+        raise ValueError(
+            f'Вес получателя {name} должен быть положительным числом, '
+            f'а не {weight!r}.')
+    return weight
+
+
+def chat_weights(tenants):
+    """Веса чатов получателей для справедливой очереди отправки."""
+    return {tenant['chat_id']: tenant.get('weight', 1)
+            for tenant in tenants.values()}
+
+
+def chat_bots(tenants):
+    """Боты, закреплённые за чатами получателей: {chat_id: id бота}."""
+    routes = {}
+    for tenant in tenants.values():
+        if tenant.get('bot') is None:
+            continue
+        chat_id = str(tenant['chat_id'])
+        if routes.setdefault(chat_id, tenant['bot']) != tenant['bot']:
+            raise ValueError(f'За чатом {chat_id} закреплены разные боты.')
+    return routes
+
+
+def load_cursors(path):
+    """Читает сохранённые метки времени получателей."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_cursors(path, cursors):
+    """Атомарно сохраняет метки времени получателей."""
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(cursors, file)
+    os.replace(tmp_path, path)
+
+
+class TenantTable:
+    """Состояние получателей в виде столбцов, адресуемых по индексу.
+
+    Числовые поля хранятся в типизированных массивах, статус последней
+    работы — кодом из statuses (-1, если статус неизвестен). Сроки опроса
+    раскладываются по секундным корзинам, поэтому на получателя не
+    заводится ни одного отдельного объекта. Набор получателей можно
+    заменить на ходу: состояние оставшихся получателей и уже идущие
+    опросы при этом не трогаются, освободившиеся индексы переиспользуются.
+
+    Получатели связаны в список по времени последнего удачного опроса
+    (столбцы prev/next), так что самый давно опрошенный получатель
+    находится за O(1).
+
+    Метка cursor задаёт следующий запрос, а сохраняется acked — метка,
+    до которой все уведомления доставлены. Пока уведомления получателя
+    не подтверждены через ack, acked не двигается; отказ в доставке
+    возвращает cursor к acked, и следующий опрос повторит изменения.
+    """
+
+    def __init__(self, interval, statuses=(), cursors=None,
+                 max_backoff=MAX_BACKOFF):
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+        self._status_codes = {status: code
+                              for code, status in enumerate(self.statuses)}
+        self._saved_cursors = dict(cursors or {})
+        self._index = {}
+        self._free = array('I')
+        self.names = []
+        self.tokens = []
+        self.chat_ids = []
+        self.cursor = array('q')
+        self.acked = array('q')
+        self.unacked = array('I')
+        self.deadline = array('d')
+        self.status = array('b')
+        self.errors = array('H')
+        self.backoff = array('f')
+        self.last_success = array('d')
+        self.flags = bytearray()
+        self._prev = array('i')
+        self._next = array('i')
+        self._head = self._tail = -1
+        self._wheel = {}
+        self._slots = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._index)
+
+    def apply(self, tenants, now):
+        """Применяет новый набор получателей, возвращает число изменений."""
+        with self._lock:
+            added = tenants.keys() - self._index.keys()
+            removed = self._index.keys() - tenants.keys()
+            changed = 0
+            for name in removed:
+                self._remove(self._index.pop(name))
+            for name, tenant in tenants.items():
+                if name in added:
+                    self._add(tenant, now)
+                    continue
+                index = self._index[name]
+                if (self.tokens[index] != tenant['practicum_token']
+                        or self.chat_ids[index] != tenant['chat_id']):
+                    self.tokens[index] = tenant['practicum_token']
+                    self.chat_ids[index] = tenant['chat_id']
+                    changed += 1
+        return len(added), len(removed), changed
+
+    def pop_due(self, now, limit=None):
+        """Возвращает (индекс, получатель, метка) тех, кого пора опросить.
+
+        Не больше limit получателей, остальные останутся в расписании.
+        Выданные получатели не попадут в выдачу до вызова complete.
+        """
+        due = []
+        with self._lock:
+            while self._slots and self._slots[0] <= now:
+                slot = heapq.heappop(self._slots)
+                bucket = self._wheel.pop(slot)
+                for position, index in enumerate(bucket):
+                    if limit is not None and len(due) >= limit:
+                        self._wheel[slot] = bucket[position:]
+                        heapq.heappush(self._slots, slot)
+                        return due
+                    if (self.flags[index] != ACTIVE
+                            or ceil(self.deadline[index]) != slot):
+                        continue
+                    self.flags[index] = ACTIVE | RUNNING
+                    due.append((index, self.tenant(index),
+                                self.cursor[index]))
+        return due
+
+    def complete(self, index, cursor, status, ok, now, pending=0):
+        """Запоминает результат опроса и планирует следующий.
+
+        pending — сколько уведомлений опроса ждут подтверждения доставки.
+        После неудачного опроса интервал удваивается до max_backoff,
+        после удачного — сбрасывается.
+        """
+        with self._lock:
+            if not self.flags[index] & RUNNING:
+                return
+            if self.flags[index] & REWIND:
+                cursor = self.acked[index]
+            self.flags[index] &= ACTIVE
+            if not self.flags[index] & ACTIVE:
+                self._release(index, cursor, pending)
+                return
+            self.cursor[index] = cursor
+            self.unacked[index] += pending
+            if not self.unacked[index]:
+                self.acked[index] = cursor
+            if status is not None:
+                self.status[index] = self._status_codes.get(status, -1)
+            if ok:
+                self.errors[index] = 0
+                self.backoff[index] = 0
+                self.last_success[index] = now
+                self._unlink(index)
+                self._link(index)
+            else:
+                self.errors[index] = min(self.errors[index] + 1, 0xFFFF)
+                self.backoff[index] = min(
+                    max(self.backoff[index] * 2, self.interval),
+                    self.max_backoff)
+            self._schedule(index, now + (self.backoff[index]
+                                         or self.interval))
+
+    def ack(self, names, ok):
+        """Подтверждает доставку уведомлений получателей names.
+
+        Имя повторяется столько раз, сколько изменений в уведомлении.
+        При отказе следующий опрос начнётся с последней доставленной метки.
+        """
+        with self._lock:
+            for name in names:
+                index = self._index.get(name)
+                if index is None:
+                    continue
+                if self.unacked[index]:
+                    self.unacked[index] -= 1
+                if not ok:
+                    if self.flags[index] & RUNNING:
+                        self.flags[index] |= REWIND
+                    else:
+                        self.cursor[index] = self.acked[index]
+                elif (not self.unacked[index]
+                      and not self.flags[index] & REWIND):
+                    self.acked[index] = self.cursor[index]
+
+    def seconds_until_next(self, now):
+        """Время до ближайшей непустой корзины сроков."""
+        with self._lock:
+            if self._slots:
+                return max(self._slots[0] - now, 0)
+        return self.interval
+
+    def tenant(self, index):
+        """Настройки получателя по индексу."""
+        return {'name': self.names[index],
+                'practicum_token': self.tokens[index],
+                'chat_id': self.chat_ids[index]}
+
+    def last_status(self, index):
+        """Последний известный статус работы получателя или None."""
+        code = self.status[index]
+        return None if code < 0 else self.statuses[code]
+
+    def stalest(self, now):
+        """Имя получателя, дольше всех не опрошенного удачно, и этот срок."""
+        with self._lock:
+            if self._head < 0:
+                return None, None
+            return (self.names[self._head],
+                    now - self.last_success[self._head])
+
+    def state(self, name, now):
+        """Состояние получателя по имени или None."""
+        with self._lock:
+            index = self._index.get(name)
+            if index is None:
+                return None
+            return {'name': name,
+                    'cursor': self.cursor[index],
+                    'acked': self.acked[index],
+                    'unacked': self.unacked[index],
+                    'staleness': now - self.last_success[index],
+                    'next_poll_in': max(self.deadline[index] - now, 0),
+                    'last_status': self.last_status(index),
+                    'errors': self.errors[index],
+                    'backoff': self.backoff[index],
+                    'polling': bool(self.flags[index] & RUNNING)}
+
+    def cursors(self):
+        """Метки времени, до которых уведомления получателей доставлены."""
+        with self._lock:
+            return {name: self.acked[index]
+                    for name, index in self._index.items()}
+
+    def _add(self, tenant, now):
+        name = tenant['name']
+        cursor = self._saved_cursors.pop(name, int(time()))
+        if self._free:
+            index = self._free.pop()
+            self.names[index] = name
+            self.tokens[index] = tenant['practicum_token']
+            self.chat_ids[index] = tenant['chat_id']
+            self.cursor[index] = self.acked[index] = cursor
+            self.unacked[index] = 0
+            self.status[index] = -1
+            self.errors[index] = 0
+            self.backoff[index] = 0
+            self.last_success[index] = now
+            self.flags[index] = ACTIVE
+        else:
+            index = len(self.names)
+            self.names.append(name)
+            self.tokens.append(tenant['practicum_token'])
+            self.chat_ids.append(tenant['chat_id'])
+            self.cursor.append(cursor)
+            self.acked.append(cursor)
+            self.unacked.append(0)
+            self.deadline.append(0)
+            self.status.append(-1)
+            self.errors.append(0)
+            self.backoff.append(0)
+            self.last_success.append(now)
+            self.flags.append(ACTIVE)
+            self._prev.append(-1)
+            self._next.append(-1)
+        self._index[name] = index
+        self._link(index)
+        self._schedule(index, now)
+
+    def _remove(self, index):
+        # Индекс идущего опроса освободится в complete, имя нужно там же.
+        self._saved_cursors[self.names[index]] = self.acked[index]
+        self.tokens[index] = self.chat_ids[index] = None
+        self._unlink(index)
+        if self.flags[index] & RUNNING:
+            self.flags[index] &= ~ACTIVE
+        else:
+            self.names[index] = None
+            self.flags[index] = 0
+            self._free.append(index)
+
+    def _release(self, index, cursor, pending):
+        # Опрос удалённого получателя завершился: его метка пригодится,
+        # если получателя вернут, но только когда всё доставлено.
+        name = self.names[index]
+        if (name not in self._index and not pending
+                and not self.unacked[index]):
+            self._saved_cursors[name] = cursor
+        self.names[index] = None
+        self._free.append(index)
+
+    def _link(self, index):
+        # В хвост списка: самый свежий удачный опрос.
+        self._prev[index] = self._tail
+        self._next[index] = -1
+        if self._tail >= 0:
+            self._next[self._tail] = index
+        else:
+            self._head = index
+        self._tail = index
+
+    def _unlink(self, index):
+        prev, following = self._prev[index], self._next[index]
+        if prev >= 0:
+            self._next[prev] = following
+        else:
+            self._head = following
+        if following >= 0:
+            self._prev[following] = prev
+        else:
+            self._tail = prev
+
+    def _schedule(self, index, deadline):
+        self.deadline[index] = deadline
+        slot = ceil(deadline)
+        bucket = self._wheel.get(slot)
+        if bucket is None:
+            bucket = self._wheel[slot] = array('I')
+            heapq.heappush(self._slots, slot)
+        bucket.append(index)
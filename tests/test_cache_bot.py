@@ -0,0 +1,117 @@
+import pytest
+
+import cache_bot
+from cache_bot import StatusCache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_bot, 'monotonic', clock)
+    return clock
+
+
+def homework(name, status, date_updated='2022-01-01T00:00:00Z'):
+    return {'homework_name': name, 'status': status,
+            'date_updated': date_updated}
+
+
+def test_status_and_history_of_unknown_chat():
+    cache = StatusCache()
+    assert cache.status(1) is None
+    assert cache.history(1) is None
+
+
+def test_status_keeps_last_state_of_each_homework(clock):
+    cache = StatusCache()
+    cache.update(1, [homework('hw1', 'reviewing')])
+    cache.update('1', [homework('hw1', 'approved'),
+                       homework('hw2', 'rejected')])
+    assert cache.status(1) == [homework('hw1', 'approved'),
+                               homework('hw2', 'rejected')]
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = StatusCache(ttl=10)
+    cache.update(1, [homework('hw1', 'approved')])
+    clock.now += 10
+    assert cache.status(1) is not None, (
+        'Запись не должна устаревать раньше ttl'
+    )
+    clock.now += 1
+    assert cache.status(1) is None
+    assert cache.history(1) is None
+
+
+def test_update_refreshes_ttl(clock):
+    cache = StatusCache(ttl=10)
+    cache.update(1, [homework('hw1', 'approved')])
+    clock.now += 8
+    cache.update(1, [])
+    clock.now += 8
+    assert cache.status(1) == [homework('hw1', 'approved')]
+
+
+def test_expired_entry_starts_from_scratch(clock):
+    cache = StatusCache(ttl=10)
+    cache.update(1, [homework('hw1', 'approved')])
+    clock.now += 11
+    cache.update(1, [homework('hw2', 'reviewing')])
+    assert cache.status(1) == [homework('hw2', 'reviewing')]
+    assert len(cache.history(1)) == 1
+
+
+def test_max_chats_evicts_least_recently_updated(clock):
+    cache = StatusCache(max_chats=2)
+    for chat_id in (1, 2, 3):
+        cache.update(chat_id, [homework('hw', 'approved')])
+        clock.now += 1
+    assert cache.status(1) is None
+    assert cache.status(2) is not None
+    assert cache.status(3) is not None
+
+
+def test_max_homeworks_drops_oldest_homework(clock):
+    cache = StatusCache(max_homeworks=2)
+    cache.update(1, [homework('hw1', 'approved'),
+                     homework('hw2', 'approved'),
+                     homework('hw3', 'approved')])
+    assert [hw['homework_name'] for hw in cache.status(1)] == ['hw2', 'hw3']
+
+
+def test_max_history_keeps_latest_changes(clock):
+    cache = StatusCache(max_history=2)
+    for status in ('reviewing', 'rejected', 'approved'):
+        cache.update(1, [homework('hw1', status)])
+    assert [record['status'] for record in cache.history(1)] == [
+        'rejected', 'approved']
+
+
+def test_history_records_only_status_changes(clock):
+    cache = StatusCache()
+    cache.update(1, [homework('hw1', 'reviewing')])
+    cache.update(1, [homework('hw1', 'reviewing', '2022-01-02T00:00:00Z')])
+    cache.update(1, [homework('hw1', 'approved')])
+    history = cache.history(1)
+    assert [record['status'] for record in history] == [
+        'reviewing', 'approved'], (
+        'История должна пополняться только при смене статуса'
+    )
+    assert history[0]['homework_name'] == 'hw1'
+    assert history[0]['date_updated'] == '2022-01-01T00:00:00Z'
+
+
+def test_homework_without_name_or_status_is_ignored(clock):
+    cache = StatusCache()
+    cache.update(1, [{'status': 'approved'}, {'homework_name': 'hw1'}])
+    assert cache.status(1) == []
+    assert cache.history(1) == []
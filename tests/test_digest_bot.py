@@ -0,0 +1,90 @@
+from digest_bot import (DIGEST_SEPARATOR, TELEGRAM_MESSAGE_LIMIT, Digest,
+                        pack_groups, pack_messages, split_message)
+
+
+def test_split_message_respects_limit():
+    assert split_message('abcdefg', 3) == ['abc', 'def', 'g']
+    assert split_message('', 3) == ['']
+
+
+def test_pack_messages_joins_while_under_limit():
+    assert pack_messages(['aa', 'bb', 'cc'], 6) == [
+        'aa' + DIGEST_SEPARATOR + 'bb', 'cc']
+
+
+def test_pack_messages_fits_telegram_limit():
+    messages = ['x' * 1000] * 10
+    packed = pack_messages(messages)
+    assert all(len(text) <= TELEGRAM_MESSAGE_LIMIT for text in packed)
+    assert len(packed) == 3, (
+        'Сообщения должны упаковываться в минимум текстов'
+    )
+    assert DIGEST_SEPARATOR.join(packed) == DIGEST_SEPARATOR.join(messages)
+
+
+def test_pack_messages_splits_oversize_message():
+    message = 'y' * (TELEGRAM_MESSAGE_LIMIT * 2 + 10)
+    packed = pack_messages(['short', message])
+    assert all(len(text) <= TELEGRAM_MESSAGE_LIMIT for text in packed)
+    assert ''.join(packed).replace(DIGEST_SEPARATOR, '') == 'short' + message
+
+
+def test_pack_groups_reports_started_messages():
+    assert pack_groups(['aaaa', 'bbbbbb', 'c'], 5) == [
+        ('aaaa', [0]), ('bbbbb', [1]), ('b' + DIGEST_SEPARATOR + 'c', [2])]
+
+
+def test_pop_due_waits_for_window():
+    digest = Digest(window=10)
+    digest.add(1, 'first', now=0)
+    digest.add(2, 'other', now=5)
+    digest.add(1, 'second', now=9)
+    assert digest.pop_due(now=9) == []
+    assert digest.pop_due(now=10) == [
+        (1, 'first' + DIGEST_SEPARATOR + 'second', (), ())]
+    assert digest.pop_due(now=14) == []
+    assert digest.pop_due(now=15) == [(2, 'other', (), ())]
+
+
+def test_pop_all_ignores_window():
+    digest = Digest(window=10)
+    digest.add(1, 'first', now=0)
+    digest.add(2, 'other', now=5)
+    assert digest.pop_all() == [(1, 'first', (), ()),
+                                (2, 'other', (), ())]
+    assert digest.pop_all() == []
+    assert digest.pop_due(now=100) == []
+
+
+def test_digest_carries_updated_and_acks():
+    digest = Digest(window=0, limit=8)
+    digest.add(1, 'aaaa', updated=(1.0,), acks=('a',), now=0)
+    digest.add(1, 'bbbb', updated=(2.0,), acks=('a',), now=0)
+    digest.add(1, 'cc', updated=(3.0,), acks=('b',), now=0)
+    assert digest.pop_due(now=0) == [
+        (1, 'aaaa', (1.0,), ('a',)),
+        (1, 'bbbb' + DIGEST_SEPARATOR + 'cc', (2.0, 3.0), ('a', 'b'))]
+
+
+def test_every_homework_produces_notification():
+    import homework
+    from cache_bot import StatusCache
+
+    response = {'current_date': 100, 'homeworks': [
+        {'homework_name': 'hw1', 'status': 'approved'},
+        {'homework_name': 'hw2', 'status': 'rejected'},
+        {'homework_name': 'hw3', 'status': 'reviewing'}]}
+    tenant = {'name': 'student', 'chat_id': 1}
+    cursor, status, ok, notifications = homework.parse_tenant(
+        tenant, 0, response, StatusCache(), fanout=None)
+    assert (cursor, status, ok) == (100, 'reviewing', True)
+    assert [notification.text for notification in notifications] == [
+        homework.parse_status(hw) for hw in response['homeworks']], (
+        'О каждой работе из ответа должно приходить уведомление, '
+        'а не только о последней'
+    )
+    digest = Digest(window=0)
+    homework.deliver(None, digest, notifications)
+    (_, text, _, acks), = digest.pop_all()
+    assert text.count('Изменился статус') == 3
+    assert acks == ('student',) * 3
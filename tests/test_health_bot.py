@@ -0,0 +1,177 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import pytest
+
+from health_bot import Health, serve_health
+from metrics_bot import LATENCY_BOUNDS, LatencyHistogram
+from tenants_bot import TenantTable
+
+
+def tenant(name):
+    return {'name': name, 'practicum_token': f'token-{name}',
+            'chat_id': f'chat-{name}'}
+
+
+def table_with(*names, now=0):
+    table = TenantTable(60)
+    table.apply({name: tenant(name) for name in names}, now)
+    return table
+
+
+def succeed(table, name, now):
+    for index, polled, _ in table.pop_due(now + 1000):
+        table.complete(index, 1, None, polled['name'] == name, now)
+
+
+def order(table):
+    names = []
+    index = table._head
+    while index >= 0:
+        names.append(table.names[index])
+        index = table._next[index]
+    return names
+
+
+def test_stalest_follows_successful_polls():
+    table = table_with('a', 'b', 'c')
+    assert table.stalest(10)[1] == 10
+    succeed(table, 'a', 5)
+    assert order(table)[-1] == 'a'
+    assert table.stalest(10)[0] != 'a'
+    for name in ('b', 'c'):
+        succeed(table, name, 6)
+    assert table.stalest(10) == ('a', 5)
+    assert order(table) == ['a', 'b', 'c']
+
+
+def test_stalest_of_empty_table():
+    assert TenantTable(60).stalest(0) == (None, None)
+
+
+def test_linked_list_survives_remove_and_readd():
+    table = table_with('a', 'b', 'c')
+    head, middle, tail = order(table)
+    table.apply({name: tenant(name) for name in (head, tail)}, 1)
+    assert order(table) == [head, tail]
+    table.apply({name: tenant(name) for name in (tail,)}, 2)
+    assert order(table) == [tail]
+    assert table.stalest(3) == (tail, 3)
+    table.apply({name: tenant(name) for name in (tail, head, middle)}, 4)
+    assert order(table)[0] == tail
+    assert sorted(order(table)[1:]) == sorted([head, middle]), (
+        'Вернувшиеся получатели встают в хвост списка'
+    )
+    backwards = []
+    index = table._tail
+    while index >= 0:
+        backwards.append(table.names[index])
+        index = table._prev[index]
+    assert backwards == order(table)[::-1]
+
+
+def test_tenant_state():
+    table = table_with('a')
+    assert table.state('missing', 0) is None
+    (index, _, _), = table.pop_due(0)
+    assert table.state('a', 1)['polling']
+    table.complete(index, 7, None, False, 1)
+    state = table.state('a', 11)
+    assert state['cursor'] == 7 and state['errors'] == 1
+    assert state['next_poll_in'] == 50
+    assert state['staleness'] == 11 and not state['polling']
+
+
+def test_percentile_without_data():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) is None
+    assert histogram.snapshot()['mean'] is None
+
+
+def test_percentile_uses_bucket_bounds():
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.record(0.01)
+    for _ in range(10):
+        histogram.record(1.0)
+    p50 = histogram.percentile(0.5)
+    assert 0.01 <= p50 <= 0.01 * 2 ** 0.5
+    assert histogram.percentile(0.9) == p50
+    assert histogram.percentile(0.95) == 1.0, (
+        'Перцентиль не может превышать максимум'
+    )
+    assert histogram.snapshot()['count'] == 100
+
+
+def test_percentile_beyond_last_bucket():
+    histogram = LatencyHistogram()
+    histogram.record(LATENCY_BOUNDS[-1] * 10)
+    histogram.record(-1)
+    assert histogram.percentile(0.99) == LATENCY_BOUNDS[-1] * 10
+    assert histogram.percentile(0.01) == LATENCY_BOUNDS[0], (
+        'Отрицательная задержка попадает в первую корзину'
+    )
+
+
+class DeadThread:
+
+    def is_alive(self):
+        return False
+
+
+def test_liveness_watches_threads_and_heartbeat():
+    table = table_with('a')
+    health = Health(table, LatencyHistogram(),
+                    threads=[threading.current_thread()])
+    assert health.live()['live']
+    assert not health.readiness()['ready']
+    health.ready = True
+    assert health.readiness()['ready']
+    health.threads.append(DeadThread())
+    assert not health.live()['live']
+    assert not health.readiness()['ready']
+    assert not Health(table, LatencyHistogram(),
+                      liveness_timeout=0).live()['live']
+
+
+@pytest.fixture
+def server():
+    table = table_with('a', 'Иван')
+    health = Health(table, LatencyHistogram())
+    server = serve_health(health, '127.0.0.1', 0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(server, path):
+    host, port = server.server_address
+    try:
+        with urlopen(f'http://{host}:{port}{path}', timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_http_status_codes(server):
+    status, body = fetch(server, '/health')
+    assert status == 200 and body['tenants'] == 2
+    assert fetch(server, '/health/live')[0] == 200
+    assert fetch(server, '/health/ready')[0] == 503
+    server.health.ready = True
+    assert fetch(server, '/health/ready')[0] == 200
+    server.health.threads.append(DeadThread())
+    assert fetch(server, '/health/live')[0] == 503
+    assert fetch(server, '/health/ready')[0] == 503
+    assert fetch(server, '/health/tenants/missing') == (404, None)
+    assert fetch(server, '/nothing') == (404, None)
+
+
+def test_http_query_and_quoted_tenant(server):
+    assert fetch(server, '/health?verbose=1')[0] == 200
+    assert fetch(server, '/health/live/')[0] == 200
+    status, body = fetch(server, '/health/tenants/' + quote('Иван'))
+    assert status == 200 and body['name'] == 'Иван'
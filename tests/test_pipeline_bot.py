@@ -0,0 +1,319 @@
+import threading
+from time import monotonic
+
+import pytest
+
+from pipeline_bot import (CLOSED, COALESCE, DROP, DROP_ERRORS, PAUSE,
+                          BoundedQueue, LaneQueue)
+from sinks_bot import Fanout, Notification, Sink
+
+
+def status(chat_id, text='status', acks=()):
+    return Notification(chat_id, text, acks=acks)
+
+
+def error(chat_id, text='error'):
+    return Notification(chat_id, text, 'error')
+
+
+def drain(queue):
+    items = []
+    while len(queue):
+        items.append(queue.get())
+    return items
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedQueue('q', 1, 'block')
+
+
+def test_drop_rejects_new_item():
+    queue = BoundedQueue('q', 1, DROP)
+    assert queue.put(status(1, 'a'))
+    assert not queue.put(status(1, 'b'))
+    assert drain(queue) == [status(1, 'a')]
+    assert queue.gauges()['dropped'] == 1
+
+
+def test_pause_waits_until_timeout():
+    queue = BoundedQueue('q', 1, PAUSE)
+    queue.put('a')
+    started = monotonic()
+    assert not queue.put('b', timeout=0.05)
+    assert monotonic() - started >= 0.05
+    assert queue.gauges()['paused'] == 1
+    assert queue.gauges()['dropped'] == 1
+
+
+def test_pause_resumes_when_space_frees():
+    queue = BoundedQueue('q', 1, PAUSE)
+    queue.put('a')
+    threading.Timer(0.05, queue.get).start()
+    assert queue.put('b', timeout=5)
+    assert drain(queue) == ['b']
+
+
+def test_drop_errors_evicts_queued_error():
+    queue = BoundedQueue('q', 2, DROP_ERRORS)
+    queue.put(error(1))
+    queue.put(status(1, 'a'))
+    assert queue.put(status(1, 'b'))
+    assert drain(queue) == [status(1, 'a'), status(1, 'b')]
+    assert queue.gauges()['dropped'] == 1
+
+
+def test_drop_errors_drops_new_error():
+    queue = BoundedQueue('q', 1, DROP_ERRORS)
+    queue.put(status(1))
+    assert not queue.put(error(1))
+    assert not queue.put(status(1), timeout=0), (
+        'Без ошибок в очереди статус ждёт места, как при pause'
+    )
+
+
+def test_coalesce_merges_status_of_same_chat():
+    queue = BoundedQueue('q', 1, COALESCE)
+    queue.put(Notification(1, 'a', updated=(1.0,), acks=('x',)))
+    assert queue.put(Notification(1, 'b', updated=(2.0,), acks=('x',)))
+    merged, = drain(queue)
+    assert merged.text == 'a\n\nb'
+    assert merged.updated == (1.0, 2.0)
+    assert merged.acks == ('x', 'x')
+    assert queue.gauges()['coalesced'] == 1
+
+
+def test_coalesce_respects_message_limit():
+    queue = BoundedQueue('q', 1, COALESCE, limit=5)
+    queue.put(status(1, 'aa'))
+    assert not queue.put(status(1, 'bbb'), timeout=0), (
+        'Склейка не должна превышать limit'
+    )
+    assert not queue.put(status(2, 'c'), timeout=0)
+    assert drain(queue) == [status(1, 'aa')]
+
+
+def test_close_delivers_queued_then_closed():
+    queue = BoundedQueue('q', 2, PAUSE)
+    queue.put('a')
+    queue.close()
+    assert not queue.put('b')
+    assert queue.get() == 'a'
+    assert queue.get() is CLOSED
+    assert queue.get(timeout=0) is CLOSED
+
+
+def test_close_wakes_waiting_producer():
+    queue = BoundedQueue('q', 1, PAUSE)
+    queue.put('a')
+    threading.Timer(0.05, queue.close).start()
+    assert not queue.put('b')
+
+
+def test_get_timeout():
+    assert BoundedQueue('q', 1).get(timeout=0.01) is None
+
+
+def test_high_watermark():
+    queue = BoundedQueue('q', 3, DROP)
+    for item in 'abc':
+        queue.put(item)
+    drain(queue)
+    assert queue.gauges()['high_watermark'] == 3
+    assert queue.gauges()['depth'] == 0
+
+
+class BlockedSink(Sink):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def deliver(self, notification):
+        self.release.wait()
+
+
+def test_publish_timeout_does_not_block_on_slow_sink():
+    acked = []
+    sink = BlockedSink('slow', maxsize=2, policy=DROP_ERRORS,
+                       ack=lambda names, ok: acked.append((names, ok)))
+    fanout = Fanout([sink])
+    for number in range(4):
+        started = monotonic()
+        fanout.publish(status(number, acks=('t',)), timeout=0.05)
+        assert monotonic() - started < 1
+    assert (('t',), False) in acked, (
+        'Отброшенное уведомление должно получить отказ в подтверждении'
+    )
+    sink.release.set()
+    fanout.close(5)
+
+
+def test_flush_digest_returns_within_timeout():
+    import homework
+    from digest_bot import Digest
+
+    sink = BlockedSink('slow', maxsize=2, policy=DROP_ERRORS)
+    fanout = Fanout([sink])
+    digest = Digest(window=0)
+    for number in range(10):
+        digest.add(number, 'status', now=0)
+    started = monotonic()
+    homework.flush_digest(fanout, digest, 0.1)
+    assert monotonic() - started < 1, (
+        'Основной цикл не должен ждать медленный приёмник дольше timeout'
+    )
+    sink.release.set()
+    fanout.close(5)
+
+
+def test_parser_does_not_block_on_slow_sink(monkeypatch):
+    import homework
+    from tenants_bot import TenantTable
+
+    monkeypatch.setattr(homework, 'PUBLISH_TIMEOUT', 0.05)
+    table = TenantTable(60)
+    table.apply({'a': {'name': 'a', 'practicum_token': 't',
+                       'chat_id': 1}}, 0)
+    sink = BlockedSink('slow', maxsize=1, policy=PAUSE, ack=table.ack)
+    fanout = Fanout([sink])
+    started = monotonic()
+    homework.deliver(fanout, None, [status(1, acks=('a',))
+                                    for _ in range(4)])
+    assert monotonic() - started < 1, (
+        'Разбор не должен ждать медленный приёмник дольше PUBLISH_TIMEOUT'
+    )
+    sink.release.set()
+    fanout.close(5)
+
+
+def test_lanes_serve_statuses_before_errors():
+    queue = LaneQueue('q', 10)
+    queue.put(error(1, 'e1'))
+    queue.put(status(2, 's1'))
+    queue.put(error(2, 'e2'))
+    queue.put(status(1, 's2'))
+    assert [item.text for item in drain(queue)] == ['s1', 's2', 'e1', 'e2']
+
+
+def test_lane_keeps_order_within_chat():
+    queue = LaneQueue('q', 10)
+    for text in 'abc':
+        queue.put(status(1, text))
+    assert [item.text for item in drain(queue)] == ['a', 'b', 'c']
+
+
+def test_weighted_round_robin_proportions():
+    queue = LaneQueue('q', 100)
+    queue.weights = {'heavy': 3, 'light': 1}
+    for number in range(20):
+        queue.put(status('heavy', f'h{number}'))
+        queue.put(status('light', f'l{number}'))
+    served = [queue.get().chat_id for _ in range(20)]
+    assert served.count('heavy') == 15
+    assert served.count('light') == 5
+    assert all(served[start:start + 4].count('light') == 1
+               for start in range(0, 20, 4)), (
+        'Взвешенный обход должен перемежать чаты, а не отдавать их пачками'
+    )
+
+
+def test_lane_queue_evicts_oldest_error():
+    queue = LaneQueue('q', 2, DROP_ERRORS)
+    queue.put(error(1, 'old'))
+    queue.put(error(2, 'new'))
+    assert queue.put(status(3, 's'))
+    assert [item.text for item in drain(queue)] == ['s', 'new']
+    assert queue.gauges()['dropped'] == 1
+
+
+def test_lane_queue_coalesces_last_status_of_chat():
+    queue = LaneQueue('q', 1, COALESCE)
+    queue.put(status(1, 'a'))
+    assert queue.put(status(1, 'b'))
+    assert [item.text for item in drain(queue)] == ['a\n\nb']
+
+
+def test_lane_gauges():
+    queue = LaneQueue('q', 10)
+    queue.put(status(1))
+    queue.put(error(1))
+    queue.get()
+    lanes = queue.gauges()['lanes']
+    assert lanes['status']['count'] == 1 and lanes['status']['depth'] == 0
+    assert lanes['error']['count'] == 0 and lanes['error']['depth'] == 1
+
+
+class RecordingSink(Sink):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delivered = []
+
+    def deliver(self, notification):
+        self.delivered.append(notification.text)
+
+
+def test_sink_thread_survives_queue_error(monkeypatch):
+    import sinks_bot
+
+    monkeypatch.setattr(sinks_bot, 'ERROR_PAUSE', 0.01)
+    sink = RecordingSink('broken').start()
+    sink.queue.weights = {1: 'bad'}
+    sink.put(status(1, 'a'))
+    sink.put(status(2, 'b'))
+    threading.Event().wait(0.1)
+    assert sink.threads[0].is_alive(), (
+        'Сбой очереди не должен останавливать поток доставки'
+    )
+    sink.queue.weights = {}
+    sink.close(5)
+    assert sorted(sink.delivered) == ['a', 'b']
+
+
+class SlowChatSink(Sink):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+        self.delivered = []
+        self.lock = threading.Lock()
+
+    def deliver(self, notification):
+        if notification.chat_id == 'slow':
+            self.release.wait()
+        with self.lock:
+            self.delivered.append(notification.text)
+
+
+def test_slow_chat_does_not_block_other_chats():
+    sink = SlowChatSink('telegram', workers=2).start()
+    for number in range(3):
+        sink.put(status('slow', f's{number}'))
+    for number in range(20):
+        sink.put(status(number % 4, f'f{number}'))
+    deadline = monotonic() + 5
+    while len(sink.delivered) < 20 and monotonic() < deadline:
+        threading.Event().wait(0.01)
+    assert sorted(sink.delivered) == sorted(f'f{number}'
+                                            for number in range(20)), (
+        'Медленный чат должен занимать только один поток доставки'
+    )
+    sink.release.set()
+    sink.close(5)
+    assert sink.delivered[-3:] == ['s0', 's1', 's2']
+
+
+def test_exclusive_lane_queue_holds_busy_chat():
+    queue = LaneQueue('q', 10, exclusive=True)
+    queue.put(status(1, 'a'))
+    queue.put(status(1, 'b'))
+    queue.put(status(2, 'c'))
+    first = queue.get()
+    assert first.text == 'a'
+    assert queue.get().text == 'c'
+    assert queue.get(timeout=0.01) is None, (
+        'Чат не выдаётся, пока его уведомление не отпущено'
+    )
+    queue.done(first)
+    assert queue.get().text == 'b'
@@ -0,0 +1,113 @@
+from http import HTTPStatus
+
+from record_bot import RECORD_API, RECORD_TELEGRAM, Recorder, read_records
+from replay_bot import replay
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body=None, text=''):
+        self.status_code = status_code
+        self.body = body
+        self.text = text
+
+    def json(self):
+        if self.body is None:
+            raise ValueError('not json')
+        return self.body
+
+
+def test_recorder_disabled_without_path(tmp_path):
+    recorder = Recorder(None)
+    recorder.api(0, FakeResponse(HTTPStatus.OK, {}))
+    recorder.telegram(1, 'text', ok=True)
+    recorder.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / 'record.jsonl')
+    recorder = Recorder(path)
+    homeworks = [{'homework_name': 'hw1', 'status': 'approved'},
+                 {'homework_name': 'hw2', 'status': 'rejected'}]
+    recorder.api(10, FakeResponse(
+        HTTPStatus.OK, {'homeworks': homeworks, 'current_date': 20}))
+    recorder.api(20, FakeResponse(HTTPStatus.OK, text='<html>oops</html>'))
+    recorder.api(20, FakeResponse(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                  {'code': 'error'}))
+    recorder.api(20, FakeResponse(HTTPStatus.OK, {'homeworks': 'broken',
+                                                  'current_date': 30}))
+    recorder.telegram(1, 'Привет', ok=False)
+    recorder.close()
+
+    api = list(read_records(path, RECORD_API))
+    assert [record['f'] for record in api] == [10, 20, 20, 20]
+    assert api[0]['b']['homeworks'] == homeworks
+    assert api[1]['r'] == '<html>oops</html>' and 'b' not in api[1]
+    assert api[2]['s'] == HTTPStatus.INTERNAL_SERVER_ERROR
+    telegram, = read_records(path, RECORD_TELEGRAM)
+    assert (telegram['c'], telegram['x'], telegram['ok']) == (
+        1, 'Привет', False)
+    assert len(list(read_records(path))) == 5
+
+    stats = replay(api, repeat=3)
+    assert stats['responses'] == 12
+    assert stats['homeworks'] == 6
+    assert stats['http_errors'] == 6, (
+        'Ответы не в JSON и с кодом не 200 считаются ошибками HTTP'
+    )
+    assert stats['TypeError'] == 3
+
+
+def test_recorder_appends(tmp_path):
+    path = str(tmp_path / 'record.jsonl')
+    for text in ('first', 'second'):
+        recorder = Recorder(path)
+        recorder.telegram(1, text, ok=True)
+        recorder.close()
+    assert [record['x'] for record in read_records(path)] == [
+        'first', 'second']
+
+
+def test_close_is_final(tmp_path):
+    path = tmp_path / 'record.jsonl'
+    recorder = Recorder(str(path))
+    recorder.telegram(1, 'before', ok=True)
+    recorder.close()
+    recorder.api(0, FakeResponse(HTTPStatus.OK, {}))
+    recorder.telegram(1, 'after', ok=True)
+    assert [record['x'] for record in read_records(str(path))] == [
+        'before'], 'После close запись не должна открывать файл снова'
+
+
+class ParsedResponse(FakeResponse):
+
+    def json(self):
+        raise AssertionError('Тело уже разобрано')
+
+
+def test_recorder_reuses_parsed_body(tmp_path):
+    path = str(tmp_path / 'record.jsonl')
+    recorder = Recorder(path)
+    recorder.api(0, ParsedResponse(HTTPStatus.OK), {'homeworks': []})
+    recorder.close()
+    record, = read_records(path)
+    assert record['b'] == {'homeworks': []}
+
+
+class BrokenRecorder:
+
+    def api(self, *args):
+        raise OSError('disk full')
+
+
+def test_recorder_failure_does_not_break_polling(monkeypatch):
+    import homework
+
+    body = {'homeworks': [], 'current_date': 1}
+    monkeypatch.setattr(homework, 'RECORDER', BrokenRecorder())
+    monkeypatch.setattr(homework.requests, 'get',
+                        lambda **kwargs: FakeResponse(HTTPStatus.OK, body))
+    assert homework.request_api({}, 0) == body, (
+        'Сбой записи трафика не должен прерывать опрос'
+    )
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from sinks_bot import Fanout, Notification, Sink
+
+
+def status(chat_id, text='status'):
+    return Notification(chat_id, text)
+
+
+def error(chat_id, text='error'):
+    return Notification(chat_id, text, 'error')
+
+
+class RecordingSink(Sink):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delivered = []
+
+    def deliver(self, notification):
+        self.delivered.append(notification.text)
+
+
+class BrokenSink(Sink):
+
+    def deliver(self, notification):
+        raise RuntimeError('down')
+
+
+class BlockedSink(Sink):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def deliver(self, notification):
+        self.release.wait()
+
+
+def test_broken_sink_does_not_affect_others():
+    broken = BrokenSink('broken')
+    working = RecordingSink('working')
+    fanout = Fanout([broken, working])
+    fanout.publish(status(1, 'a'))
+    fanout.publish(status(1, 'b'))
+    fanout.close(5)
+    assert working.delivered == ['a', 'b']
+    assert broken.failed == 2 and working.sent == 2
+
+
+def test_full_sink_drops_instead_of_blocking():
+    sink = BlockedSink('slow', maxsize=1)
+    fanout = Fanout([sink])
+    for number in range(5):
+        fanout.publish(status(number))
+    assert sink.queue.gauges()['dropped'] >= 3, (
+        'Переполненный приёмник не должен задерживать публикацию'
+    )
+    sink.release.set()
+    fanout.close(5)
+
+
+def test_errors_go_only_to_opted_in_sinks():
+    main = RecordingSink('main', errors=True)
+    team = RecordingSink('team')
+    fanout = Fanout([main, team])
+    fanout.publish(error(1, 'e'))
+    fanout.publish(status(1, 's'))
+    fanout.close(5)
+    assert sorted(main.delivered) == ['e', 's']
+    assert team.delivered == ['s'], (
+        'Ошибки получателя не должны уходить в общие приёмники'
+    )
+
+
+def test_request_error_does_not_leak_token(monkeypatch):
+    import homework
+
+    def fail(**kwargs):
+        raise homework.requests.ConnectionError('refused')
+
+    monkeypatch.setattr(homework, 'HEADERS',
+                        {'Authorization': 'OAuth secret'})
+    monkeypatch.setattr(homework.requests, 'get', fail)
+    with pytest.raises(Exception) as raised:
+        homework.get_api_answer(0)
+    assert 'secret' not in str(raised.value)
+
+
+def test_primary_sink_acknowledges_delivery():
+    acked = []
+
+    def ack(names, ok):
+        acked.append((names, ok))
+
+    working = RecordingSink('working', ack=ack)
+    broken = BrokenSink('broken', ack=ack)
+    for sink in (working, broken):
+        sink.start()
+        sink.put(Notification(1, 'text', acks=(sink.name,)))
+        sink.close(5)
+    assert sorted(acked) == [(('broken',), False), (('working',), True)]
+
+
+def test_dropped_notification_is_nacked():
+    acked = []
+    sink = BlockedSink('slow', maxsize=1,
+                       ack=lambda names, ok: acked.append((names, ok)))
+    fanout = Fanout([sink])
+    for number in range(5):
+        fanout.publish(Notification(number, 'text', acks=('a',)))
+    assert (('a',), False) in acked, (
+        'Отброшенное уведомление должно получить отказ в подтверждении'
+    )
+    sink.release.set()
+    fanout.close(5)
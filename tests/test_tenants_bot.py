@@ -0,0 +1,329 @@
+import json
+
+import pytest
+
+from tenants_bot import (TenantTable, chat_bots, chat_weights, load_cursors,
+                         load_tenants, save_cursors)
+
+
+def tenant(name, token=None, chat_id=None):
+    return {'name': name, 'practicum_token': token or f'token-{name}',
+            'chat_id': chat_id or f'chat-{name}'}
+
+
+def tenants(*items):
+    return {item['name']: item for item in items}
+
+
+def names(due):
+    return sorted(item[1]['name'] for item in due)
+
+
+def test_load_tenants_default_without_path():
+    default = tenant('default')
+    assert load_tenants(None, default) == {'default': default}
+
+
+def test_load_tenants_reads_weights(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([tenant('a'), dict(tenant('b'), weight=3)]))
+    loaded = load_tenants(str(path))
+    assert loaded['a'] == dict(tenant('a'), weight=1)
+    assert chat_weights(loaded) == {'chat-a': 1, 'chat-b': 3}
+
+
+def test_load_tenants_rejects_missing_fields(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([{'name': 'a', 'chat_id': 1}]))
+    with pytest.raises(KeyError):
+        load_tenants(str(path))
+
+
+def test_cursors_round_trip(tmp_path):
+    path = str(tmp_path / 'cursors.json')
+    assert load_cursors(path) == {}
+    save_cursors(path, {'a': 1, 'b': 2})
+    save_cursors(path, {'a': 3})
+    assert load_cursors(path) == {'a': 3}
+    assert not (tmp_path / 'cursors.json.tmp').exists()
+
+
+def test_apply_adds_removes_and_changes():
+    table = TenantTable(60, cursors={'a': 5})
+    assert table.apply(tenants(tenant('a'), tenant('b')), 0) == (2, 0, 0)
+    assert table.cursors()['a'] == 5
+    result = table.apply(tenants(tenant('a', token='new'), tenant('c')), 0)
+    assert result == (1, 1, 1)
+    assert len(table) == 2
+    assert sorted(table.cursors()) == ['a', 'c']
+    due = {item[1]['name']: item for item in table.pop_due(0)}
+    assert due['a'][1]['practicum_token'] == 'new'
+
+
+def test_apply_keeps_state_of_unchanged_tenants():
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.complete(index, 100, None, True, 0)
+    table.apply(tenants(tenant('a'), tenant('b')), 10)
+    assert table.cursors()['a'] == 100
+    assert names(table.pop_due(10)) == ['b'], (
+        'Перечитывание не должно сбрасывать расписание оставшихся'
+    )
+
+
+def test_removed_tenant_restores_saved_cursor():
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.complete(index, 100, None, True, 0)
+    table.apply({}, 0)
+    assert table.cursors() == {}
+    table.apply(tenants(tenant('a')), 0)
+    assert table.cursors() == {'a': 100}
+
+
+def test_removal_while_polling():
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.apply({}, 0)
+    table.apply(tenants(tenant('b')), 0)
+    (other, _, _), = table.pop_due(0)
+    assert other != index, (
+        'Индекс идущего опроса нельзя отдавать до complete'
+    )
+    table.complete(index, 100, None, True, 0)
+    assert list(table.cursors()) == ['b']
+    assert table.pop_due(1000) == []
+    table.apply(tenants(tenant('b'), tenant('c')), 0)
+    assert table.tenant(index) == tenant('c'), (
+        'После complete индекс удалённого получателя переиспользуется'
+    )
+
+
+class FakeFanout:
+
+    def __init__(self):
+        self.weights = None
+
+    def set_weights(self, weights):
+        self.weights = weights
+
+
+class FakeTransport:
+
+    def __init__(self):
+        self.routes = None
+
+    def set_routes(self, routes):
+        self.routes = routes
+
+
+def test_reload_tenants_applies_file(tmp_path, monkeypatch):
+    import homework
+
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([tenant('a'), tenant('b')]))
+    monkeypatch.setattr(homework, 'TENANTS_FILE', str(path))
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a')), 0)
+    fanout = FakeFanout()
+    homework.reload_tenants(table, fanout, FakeTransport())
+    assert sorted(table.cursors()) == ['a', 'b']
+    assert fanout.weights == {'chat-a': 1, 'chat-b': 1}
+
+
+def test_reload_tenants_keeps_table_on_broken_file(tmp_path, monkeypatch):
+    import homework
+
+    path = tmp_path / 'tenants.json'
+    path.write_text('[{"name": "a"')
+    monkeypatch.setattr(homework, 'TENANTS_FILE', str(path))
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a'), tenant('b')), 0)
+    fanout = FakeFanout()
+    homework.reload_tenants(table, fanout, FakeTransport())
+    assert sorted(table.cursors()) == ['a', 'b']
+    assert fanout.weights is None
+
+
+def test_pop_due_waits_for_deadline_bucket():
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a')), 0.5)
+    assert table.pop_due(0.5) == [], (
+        'Срок раскладывается в корзину ceil(deadline)'
+    )
+    assert names(table.pop_due(1)) == ['a']
+    assert table.pop_due(1000) == [], (
+        'Опрашиваемый получатель не выдаётся повторно до complete'
+    )
+
+
+def test_pop_due_limit_keeps_rest_scheduled():
+    table = TenantTable(60)
+    table.apply(tenants(*(tenant(name) for name in 'abcde')), 0)
+    first = table.pop_due(0, limit=2)
+    assert len(first) == 2
+    rest = table.pop_due(0)
+    assert len(rest) == 3
+    assert sorted(names(first) + names(rest)) == list('abcde')
+
+
+def test_seconds_until_next():
+    table = TenantTable(60)
+    assert table.seconds_until_next(0) == 60
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.complete(index, 1, None, True, 0)
+    assert table.seconds_until_next(10) == 50
+
+
+def test_backoff_doubles_and_resets():
+    table = TenantTable(60, max_backoff=200)
+    table.apply(tenants(tenant('a')), 0)
+    now = 0
+    for expected in (60, 120, 200, 200):
+        (index, _, _), = table.pop_due(now)
+        table.complete(index, 0, None, False, now)
+        assert table.backoff[index] == expected
+        assert table.pop_due(now + expected - 1) == []
+        now += expected
+    assert table.errors[index] == 4
+    (index, _, _), = table.pop_due(now)
+    table.complete(index, 0, 'approved', True, now)
+    assert table.backoff[index] == 0 and table.errors[index] == 0
+    assert table.pop_due(now + 59) == []
+    assert names(table.pop_due(now + 60)) == ['a']
+
+
+def test_last_status_codes():
+    table = TenantTable(60, statuses=('approved', 'rejected'))
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    assert table.last_status(index) is None
+    table.complete(index, 1, 'rejected', True, 0)
+    assert table.last_status(index) == 'rejected'
+    (index, _, _), = table.pop_due(60)
+    table.complete(index, 1, 'unknown', True, 60)
+    assert table.last_status(index) is None
+
+
+def test_free_index_is_reused():
+    table = TenantTable(60)
+    table.apply(tenants(tenant('a'), tenant('b')), 0)
+    index = table.pop_due(0)[0][0]
+    removed = table.tenant(index)['name']
+    table.complete(index, 1, None, True, 0)
+    table.apply(tenants(*(tenant(name) for name in 'ab' if name != removed),
+                        tenant('c')), 0)
+    assert table.tenant(index) == tenant('c')
+    assert len(table.names) == 2
+
+
+def test_removal_while_polling_keeps_new_cursor():
+    table = TenantTable(60, cursors={'a': 5})
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, cursor), = table.pop_due(0)
+    assert cursor == 5
+    table.apply({}, 0)
+    table.complete(index, 100, None, True, 0)
+    table.apply(tenants(tenant('a')), 0)
+    assert table.cursors() == {'a': 100}, (
+        'Метка завершившегося опроса не должна теряться при удалении'
+    )
+
+
+def test_removal_while_polling_keeps_cursor_of_undelivered():
+    table = TenantTable(60, cursors={'a': 5})
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.apply({}, 0)
+    table.complete(index, 100, None, True, 0, pending=1)
+    table.apply(tenants(tenant('a')), 0)
+    assert table.cursors() == {'a': 5}
+
+
+def test_cursor_saved_only_after_ack():
+    table = TenantTable(60, cursors={'a': 5})
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.complete(index, 100, None, True, 0, pending=2)
+    assert table.cursors() == {'a': 5}
+    assert table.pop_due(60)[0][2] == 100, (
+        'Следующий опрос продолжается с новой метки'
+    )
+    table.ack(('a',), True)
+    assert table.cursors() == {'a': 5}
+    table.ack(('a',), True)
+    assert table.cursors() == {'a': 100}
+
+
+def test_failed_delivery_rewinds_cursor():
+    table = TenantTable(60, cursors={'a': 5})
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.complete(index, 100, None, True, 0, pending=1)
+    table.ack(('a',), False)
+    assert table.cursors() == {'a': 5}
+    assert table.pop_due(60)[0][2] == 5, (
+        'После сбоя доставки изменения запрашиваются повторно'
+    )
+
+
+def test_failed_delivery_during_poll_rewinds_on_complete():
+    table = TenantTable(60, cursors={'a': 5})
+    table.apply(tenants(tenant('a')), 0)
+    (index, _, _), = table.pop_due(0)
+    table.complete(index, 100, None, True, 0, pending=1)
+    (index, _, cursor), = table.pop_due(60)
+    assert cursor == 100
+    table.ack(('a',), False)
+    table.complete(index, 200, None, True, 60)
+    assert table.cursors() == {'a': 5}
+    assert table.pop_due(120)[0][2] == 5
+
+
+def test_ack_of_unknown_tenant_is_ignored():
+    table = TenantTable(60)
+    table.ack(('missing',), False)
+    assert table.cursors() == {}
+
+
+@pytest.mark.parametrize('weight', ['2', 0, -1, True, None, float('nan')])
+def test_load_tenants_rejects_bad_weight(tmp_path, weight):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([tenant('a'),
+                                dict(tenant('b'), weight=weight)]))
+    with pytest.raises(ValueError):
+        load_tenants(str(path))
+
+
+def test_reload_tenants_rejects_bad_weight(tmp_path, monkeypatch):
+    import homework
+
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([tenant('a'), dict(tenant('b'), weight='2')]))
+    monkeypatch.setattr(homework, 'TENANTS_FILE', str(path))
+    table = TenantTable(60)
+    table.apply(tenants(tenant('c')), 0)
+    fanout = FakeFanout()
+    homework.reload_tenants(table, fanout, FakeTransport())
+    assert list(table.cursors()) == ['c'], (
+        'Файл с неверным весом отклоняется целиком'
+    )
+    assert fanout.weights is None
+
+
+def test_load_tenants_reads_bot(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([dict(tenant('a'), bot=123), tenant('b')]))
+    loaded = load_tenants(str(path))
+    assert loaded['a']['bot'] == '123'
+    assert chat_bots(loaded) == {'chat-a': '123'}
+
+
+def test_chat_bots_rejects_conflicting_bots():
+    with pytest.raises(ValueError):
+        chat_bots(tenants(dict(tenant('a', chat_id=1), bot='1'),
+                          dict(tenant('b', chat_id=1), bot='2')))
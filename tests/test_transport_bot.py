@@ -0,0 +1,116 @@
+import pytest
+
+import transport_bot
+from transport_bot import TelegramTransport
+
+
+class FakeBot:
+
+    def __init__(self, token=None, request=None):
+        self.token = token
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None):
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture(autouse=True)
+def fake_bot(monkeypatch):
+    monkeypatch.setattr(transport_bot, 'Bot', FakeBot)
+
+
+def tokens(count):
+    return [f'{number}:secret' for number in range(1, count + 1)]
+
+
+def test_requires_token():
+    with pytest.raises(ValueError):
+        TelegramTransport([])
+
+
+def test_single_bot_serves_all_chats():
+    transport = TelegramTransport(tokens(1))
+    transport.send_message(5, 'text')
+    assert transport.bots[0].sent == [(5, 'text')]
+
+
+def test_explicit_route_wins():
+    transport = TelegramTransport(tokens(3))
+    chats = range(50)
+    transport.set_routes({chat_id: '2' for chat_id in chats})
+    assert all(transport.bot_for(chat_id).token == '2:secret'
+               for chat_id in chats)
+    assert transport.bot_for('1').token == '2:secret', (
+        'Маршрут не должен зависеть от типа chat_id'
+    )
+
+
+def test_unknown_bot_keeps_previous_routes():
+    transport = TelegramTransport(tokens(2))
+    transport.set_routes({7: '2'})
+    with pytest.raises(ValueError):
+        transport.set_routes({7: '1', 8: '9'})
+    assert transport.bot_for(7).token == '2:secret'
+
+
+def test_fallback_is_stable_when_token_added():
+    chats = range(1000)
+    before = TelegramTransport(tokens(4))
+    after = TelegramTransport(tokens(5))
+    moved = [chat_id for chat_id in chats
+             if before.bot_for(chat_id).token
+             != after.bot_for(chat_id).token]
+    assert all(after.bot_for(chat_id).token == '5:secret'
+               for chat_id in moved), (
+        'При добавлении токена чаты переезжают только на новый бот'
+    )
+    assert len(moved) < len(chats) / 3
+
+
+def test_fallback_spreads_chats():
+    transport = TelegramTransport(tokens(4))
+    used = {transport.bot_for(chat_id).token for chat_id in range(100)}
+    assert len(used) == 4
+
+
+def test_check_tokens_accepts_token_list(monkeypatch):
+    import homework
+
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', None)
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKENS', '1:a,2:b')
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '1')
+    monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'token')
+    assert homework.check_tokens()
+    assert homework.telegram_tokens() == ['1:a', '2:b']
+
+
+def test_env_chats_are_pinned_to_first_token(monkeypatch):
+    import homework
+
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKENS', '1:a,2:b')
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '10')
+    monkeypatch.setattr(homework, 'TEAM_CHAT_ID', '20')
+    monkeypatch.setattr(homework, 'TELEGRAM_BOT', None)
+    monkeypatch.setattr(homework, 'TEAM_BOT', None)
+    configs = {'default': homework.default_tenant()}
+    assert homework.chat_routes(configs) == {'10': '1', '20': '1'}
+    monkeypatch.setattr(homework, 'TEAM_BOT', '2')
+    assert homework.chat_routes(configs) == {'10': '1', '20': '2'}
+
+
+def test_env_bot_is_validated(monkeypatch):
+    import homework
+
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKENS', '1:a,2:b')
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '10')
+    monkeypatch.setattr(homework, 'TEAM_CHAT_ID', '10')
+    monkeypatch.setattr(homework, 'TELEGRAM_BOT', '2')
+    monkeypatch.setattr(homework, 'TEAM_BOT', '1')
+    with pytest.raises(ValueError):
+        homework.chat_routes({'default': homework.default_tenant()})
+    monkeypatch.setattr(homework, 'TEAM_BOT', None)
+    monkeypatch.setattr(homework, 'TELEGRAM_BOT', '9')
+    transport = TelegramTransport(tokens(2))
+    with pytest.raises(ValueError):
+        transport.set_routes(
+            homework.chat_routes({'default': homework.default_tenant()}))
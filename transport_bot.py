@@ -0,0 +1,64 @@
+from zlib import crc32
+
+from telegram import Bot
+from telegram.utils.request import Request
+
+TELEGRAM_POOL_SIZE = 8
+
+
+def bot_id(token):
+    """Идентификатор бота — часть токена до двоеточия."""
+    return token.split(':', 1)[0]
+
+
+class TelegramTransport:
+    """Общий транспорт Telegram для всех приёмников и команд.
+
+    На каждый токен создаётся один Bot со своим пулом keep-alive
+    соединений размера pool_size. Чат всегда обслуживает один и тот же
+    бот, поэтому порядок сообщений в чате сохраняется, а лимиты Telegram
+    на бота делятся между токенами.
+
+    Бот чата задаётся явно через set_routes (писать в личный чат может
+    только бот, которого пользователь запустил). Остальные чаты
+    распределяются хешированием с наибольшим весом (rendezvous): при
+    добавлении или удалении токена переезжает лишь доля чатов этого бота.
+    """
+
+    def __init__(self, tokens, pool_size=TELEGRAM_POOL_SIZE):
+        if not tokens:
+            raise ValueError('Не задан ни один токен Telegram.')
+        self.bots = [Bot(token=token,
+                         request=Request(con_pool_size=pool_size))
+                     for token in tokens]
+        self._by_id = {bot_id(token): bot
+                       for token, bot in zip(tokens, self.bots)}
+        self._routes = {}
+
+    def set_routes(self, routes):
+        """Закрепляет чаты за ботами: routes — {chat_id: id бота}.
+
+        Неизвестный id бота — ValueError, прежние маршруты остаются.
+        """
+        unknown = {bot for bot in routes.values() if bot not in self._by_id}
+        if unknown:
+            raise ValueError(f'Нет токенов для ботов {sorted(unknown)}.')
+        self._routes = {str(chat_id): self._by_id[bot]
+                        for chat_id, bot in routes.items()}
+
+    def bot_for(self, chat_id):
+        """Бот, который обслуживает чат."""
+        chat_id = str(chat_id)
+        bot = self._routes.get(chat_id)
+        if bot is not None:
+            return bot
+        if len(self.bots) == 1:
+            return self.bots[0]
+        return self._by_id[max(
+            self._by_id,
+            key=lambda bot: crc32(f'{bot}:{chat_id}'.encode()))]
+
+    def send_message(self, chat_id, text, **kwargs):
+        """Отправляет сообщение ботом, закреплённым за чатом."""
+        return self.bot_for(chat_id).send_message(
+            chat_id=chat_id, text=text, **kwargs)